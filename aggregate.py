@@ -0,0 +1,209 @@
+"""
+Study-level statistics over result files.
+
+Result files are read as a stream and split at the repeated session headers (see columnar.py), so memory does not
+grow with the number of participants. Chunks of sessions can be handed to a process pool: every chunk gives running
+statistics (count, mean and sum of squared deviations) that are merged into the study statistics.
+
+Per word (text number, word number, word) and per screen (text number, screen number), every session counts once.
+Usage:
+    python aggregate.py results.csv [more result files] --out study --workers 4
+writes study_words.csv and study_screens.csv with count, mean and variance of every field.
+"""
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from columnar import iter_session_records, parse_records
+
+WORD_FIELDS = ("mean_value", "drawing_time_word")
+SCREEN_FIELDS = ("mean_screen_value", "screen_drawing_time", "time_until_next_screen")
+MISSING = 99999  # written for measures that do not exist (e.g. the time until the next screen on the last screen)
+
+
+class RunningStats:
+    """
+    Mean and variance of a stream of numbers (Welford), mergeable with the statistics of another stream (Chan).
+
+    Attributes:
+        n (int): number of values.
+        mean (float): mean of the values.
+        m2 (float): sum of the squared deviations from the mean.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.
+        self.m2 = 0.
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def merge(self, other):
+        if other.n == 0:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+
+    @property
+    def variance(self):
+        # sample variance, nan for less than two values
+        return self.m2 / (self.n - 1) if self.n > 1 else float("nan")
+
+
+def to_number(value):
+    try:
+        x = float(value)
+    except ValueError:
+        return None
+    if x != x or x == MISSING:
+        return None
+    return x
+
+
+def add_rows(stats, rows, key_indices, field_indices):
+    """
+    Adds the fields of every first row of a key (per session) to the statistics of that key.
+
+    Args:
+        stats (dict): key -> {field: RunningStats}, updated in place.
+        rows (list of lists): the rows of one session.
+        key_indices (list of int): columns that form the key.
+        field_indices (dict): field name -> column.
+    """
+    seen = set()
+    for row in rows:
+        key = tuple(row[i] for i in key_indices)
+        if key in seen:  # e.g. the words of a screen all carry the screen measures, one row per sample in fancy files
+            continue
+        seen.add(key)
+        key_stats = stats.setdefault(key, {})
+        for field, i in field_indices.items():
+            x = to_number(row[i])
+            if x is not None:
+                key_stats.setdefault(field, RunningStats()).add(x)
+
+
+def aggregate_chunk(sessions):
+    """
+    Statistics of a chunk of sessions (runs in a worker process).
+
+    Args:
+        sessions (list of tuple): (header, delimiter, records) of every session of the chunk.
+
+    Returns:
+        dict, dict: word statistics and screen statistics, key -> {field: RunningStats}.
+    """
+    words, screens = {}, {}
+    for header, delimiter, records in sessions:
+        rows = parse_records(header, delimiter, records)
+        text_number = [header.index("text_number_in_experiment")] if "text_number_in_experiment" in header else []
+        add_rows(words, rows, text_number + [header.index("number"), header.index("text")],
+                 {f: header.index(f) for f in WORD_FIELDS if f in header})
+        add_rows(screens, rows, text_number + [header.index("screen_number")],
+                 {f: header.index(f) for f in SCREEN_FIELDS if f in header})
+    return words, screens
+
+
+def merge_stats(total, part):
+    for key, fields in part.items():
+        key_stats = total.setdefault(key, {})
+        for field, s in fields.items():
+            key_stats.setdefault(field, RunningStats()).merge(s)
+
+
+def iter_chunks(paths, chunk_sessions):
+    chunk = []
+    for path in paths:
+        for session in iter_session_records(path):
+            chunk.append(session)
+            if len(chunk) == chunk_sessions:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def aggregate(paths, workers=1, chunk_sessions=50):
+    """
+    Statistics of all sessions in the result files.
+
+    Args:
+        paths (list of str): result files (results.csv with a header for every session, or fancy files).
+        workers (int, optional): number of worker processes, 1 runs everything in this process. Defaults to 1.
+        chunk_sessions (int, optional): number of sessions per chunk. Defaults to 50.
+
+    Returns:
+        dict, dict, int: word statistics, screen statistics and the number of sessions.
+    """
+    words, screens, n_sessions = {}, {}, 0
+    chunks = iter_chunks(paths, chunk_sessions)
+    if workers <= 1:
+        for chunk in chunks:
+            n_sessions += len(chunk)
+            part_words, part_screens = aggregate_chunk(chunk)
+            merge_stats(words, part_words)
+            merge_stats(screens, part_screens)
+        return words, screens, n_sessions
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []  # at most two chunks per worker are read ahead, so memory stays bounded
+        for chunk in chunks:
+            n_sessions += len(chunk)
+            pending.append(pool.submit(aggregate_chunk, chunk))
+            while len(pending) >= 2 * workers:
+                part_words, part_screens = pending.pop(0).result()
+                merge_stats(words, part_words)
+                merge_stats(screens, part_screens)
+        for future in pending:
+            part_words, part_screens = future.result()
+            merge_stats(words, part_words)
+            merge_stats(screens, part_screens)
+    return words, screens, n_sessions
+
+
+def sort_key(key):
+    # numeric parts sort as numbers (screen 2 before screen 10)
+    return tuple((0, float(k), "") if to_number(k) is not None else (1, 0., k) for k in key)
+
+
+def write_stats(stats, key_names, fields, result_file):
+    if stats and len(next(iter(stats))) == len(key_names) - 1:  # no text number in the result files
+        key_names = key_names[1:]
+    columns = list(key_names)
+    for field in fields:
+        columns += [f"{field}_n", f"{field}_mean", f"{field}_var"]
+    with open(result_file, "w", newline="") as r_file:
+        writer = csv.writer(r_file, dialect="excel", delimiter=";")
+        writer.writerow(columns)
+        for key in sorted(stats, key=sort_key):
+            row = list(key)
+            for field in fields:
+                s = stats[key].get(field, RunningStats())
+                row += [s.n, round(s.mean, 6) if s.n else "", round(s.variance, 6) if s.n > 1 else ""]
+            writer.writerow(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="per-word and per-screen statistics over result files")
+    parser.add_argument("paths", nargs="+", help="result files with a header for every session")
+    parser.add_argument("--out", default="study", help="prefix of the output files (default: study)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (default: 1)")
+    parser.add_argument("--chunk-sessions", type=int, default=50, help="sessions per chunk (default: 50)")
+    args = parser.parse_args()
+    words, screens, n_sessions = aggregate(args.paths, args.workers, args.chunk_sessions)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    write_stats(words, ("text_number_in_experiment", "number", "text"), WORD_FIELDS, args.out + "_words.csv")
+    write_stats(screens, ("text_number_in_experiment", "screen_number"), SCREEN_FIELDS, args.out + "_screens.csv")
+    print(f"{n_sessions} sessions: {len(words)} words, {len(screens)} screens "
+          f"-> {args.out}_words.csv, {args.out}_screens.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,11 @@
 import math
 import csv
-import pandas as pd
-import numpy as np
 import pygame as pg
 
 
 def import_csv(filename):
     """
-    Import data from a CSV file and store it as a list of dictionaries.
+    Import data from a CSV file (or a plain text file, see iter_paragraphs) and store it as a list of dictionaries.
 
     Args:
         filename (str): The path to the CSV file.
@@ -15,13 +13,8 @@ def import_csv(filename):
     Returns:
         list: A list of dictionaries, where each dictionary represents a row from the CSV file.
     """
-    data_list = []
     try:
-        with open(filename, newline='', encoding='utf-8-sig') as csv_file:
-            reader = csv.DictReader(csv_file, dialect='excel', delimiter=";")
-            for row in reader:
-                data_list.append(dict(row))
-        return data_list
+        return list(iter_paragraphs(filename))
     except FileNotFoundError:
         print(f"Error: File '{filename}' not found.")
         # Handle the error further or exit the program gracefully.
@@ -29,6 +22,30 @@ def import_csv(filename):
         return []
 
 
+def iter_paragraphs(filename):
+    """
+    Reads a text paragraph by paragraph, without keeping the whole file in memory.
+
+    A .csv file (delimiter ";") has one paragraph per row, in a column named "text", the other columns are properties
+    of the paragraph. Any other file is plain text with one paragraph per line, empty lines are skipped.
+
+    Args:
+        filename (str): The path to the text file.
+
+    Yields:
+        dict: the row of a paragraph, at least {"text": ...}.
+    """
+    with open(filename, newline='', encoding='utf-8-sig') as text_file:
+        if filename.lower().endswith(".csv"):
+            for row in csv.DictReader(text_file, dialect='excel', delimiter=";"):
+                yield dict(row)
+        else:
+            for line in text_file:
+                line = line.strip()
+                if line:
+                    yield {"text": line}
+
+
 def arrow(screen, line_color, triangle_color, start, end, triangle_radius):
     """
     Draw an arrow on a Pygame screen.
@@ -77,44 +94,7 @@ def get_trial_input():
     return int(user_input)
 
 
-def compress_data(data, verbose=False):
-    """
-    Compress data types in a DataFrame to optimize memory usage.
-
-    Args:
-        data (list of dict): List of dictionaries containing data.
-        verbose (bool, optional): Whether to print verbose output. Defaults to False.
-
-    Returns:
-        pd.DataFrame: Compressed DataFrame.
-    """
-    df = pd.DataFrame.from_dict(data)
-    numerics = ['int16', 'int32', 'int64', 'float16', 'float32', 'float64']
-    for col in df.columns:
-        col_type = df[col].dtypes
-        if col_type in numerics:
-            c_min = df[col].min()
-            c_max = df[col].max()
-            if str(col_type)[:3] == 'int':
-                if c_min > np.iinfo(np.int8).min and c_max < np.iinfo(np.int8).max:
-                    df[col] = df[col].astype(np.int8)
-                elif c_min > np.iinfo(np.int16).min and c_max < np.iinfo(np.int16).max:
-                    df[col] = df[col].astype(np.int16)
-                elif c_min > np.iinfo(np.int32).min and c_max < np.iinfo(np.int32).max:
-                    df[col] = df[col].astype(np.int32)
-                elif c_min > np.iinfo(np.int64).min and c_max < np.iinfo(np.int64).max:
-                    df[col] = df[col].astype(np.int64)
-            else:
-                if c_min > np.finfo(np.float16).min and c_max < np.finfo(np.float16).max:
-                    df[col] = df[col].astype(np.float16)
-                elif c_min > np.finfo(np.float32).min and c_max < np.finfo(np.float32).max:
-                    df[col] = df[col].astype(np.float32)
-                else:
-                    df[col] = df[col].astype(np.float64)
-    return df
-
 # Example usage:
 # data = import_csv("data.csv")
-# compressed_data = compress_data(data, verbose=True)
 # trial_input = get_trial_input()
 # arrow(screen, line_color, triangle_color, start, end, triangle_radius)
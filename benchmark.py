@@ -0,0 +1,292 @@
+"""
+Benchmarks of the layout, drawing and export paths.
+
+Synthetic texts of several sizes (number of words) are laid out, drawn on with synthetic strokes of several densities
+(pixels between two mouse moves: the smaller, the more points per screen) and saved, everything headless (see
+replay.py). The startup of a session is measured in fresh interpreters: the time to the first frame (the first
+training screen) and to the first screen of the text, with the imports and the layout of both texts as in main.py,
+once without and once with the layout cache. The timings go to a json file, a second file can be given to compare
+against:
+    python benchmark.py --out benchmark_new.json --compare benchmark_old.json
+    python benchmark.py --sizes 1000 --densities 4 --startup-runs 1   (a quick run)
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from replay import *
+from font_cache import FontMetrics
+
+SIZES = (1000, 10000, 100000)  # words of the synthetic texts
+DENSITIES = (2, 8, 32)  # pixels between two mouse moves
+PARAGRAPH_WORDS = 120  # mean number of words of a paragraph
+VOCABULARY = 5000  # distinct words of the synthetic texts
+STARTUP_RUNS = 5  # fresh interpreters per startup configuration
+TRAINING_TEXT = "training_texts_english.csv"  # the training text of main.py
+SYLLABLES = ("ka", "lo", "mi", "ne", "sur", "tel", "ab", "or", "vin", "de", "qua", "spe", "ri", "on", "ex")
+
+
+def synthetic_text(n_words, seed=0):
+    """
+    A text as read by import_csv: one row per paragraph with a "text" and a further property.
+
+    Args:
+        n_words (int): number of words.
+        seed (int, optional): random seed. Defaults to 0.
+
+    Returns:
+        list of dict: the rows of the text.
+    """
+    rnd = random.Random(seed)
+    vocabulary = ["".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(1, 4))) for _ in range(VOCABULARY)]
+    rows = []
+    while n_words > 0:
+        length = min(n_words, max(1, int(rnd.gauss(PARAGRAPH_WORDS, PARAGRAPH_WORDS / 3))))
+        words = [rnd.choice(vocabulary) for _ in range(length)]
+        rows.append({"text": " ".join(words), "condition": rnd.choice(("a", "b"))})
+        n_words -= length
+    return rows
+
+
+def stroke_trace(width, height, density, rnd):
+    """
+    Mouse positions of one line over a drawing box, from left to right.
+
+    Args:
+        width (int): width of the drawing box.
+        height (int): height of the drawing box.
+        density (int): mean number of pixels between two positions.
+        rnd (random.Random): source of the random moves.
+
+    Returns:
+        list of tuple: (x, y) relative positions.
+    """
+    x, y, trace = 0, height, []
+    while x < width:
+        x = min(width, x + rnd.randint(1, 2 * density - 1))
+        y = max(0, min(height, y + rnd.randint(-8, 8)))
+        trace.append((x, y))
+    return trace
+
+
+class Timer:
+    """
+    Collects the timings of one benchmark run.
+
+    Attributes:
+        results (list of dict): one entry per timed stage.
+    """
+
+    def __init__(self):
+        self.results = []
+
+    def add(self, stage, seconds, calls=1, **parameters):
+        self.results.append(dict(stage=stage, seconds=round(seconds, 6), calls=calls,
+                                 per_call=round(seconds / max(calls, 1), 9), **parameters))
+        print(f"{stage:<32} {str(parameters):<34} {seconds:9.4f} s  ({calls} calls)")
+
+
+def prepare(data, my_screen):
+    # a fresh, laid out text (not timed)
+    words = get_words(data)
+    words[0].set_color(*TEXT_COLORS)
+    compute_size_words(words)
+    screens, words = initialize(words, my_screen)
+    return screens, words
+
+
+def bench_size(timer, n_words, densities, my_screen, font_name, directory):
+    data = synthetic_text(n_words)
+    start = time.perf_counter()
+    words = get_words(data)
+    timer.add("get_words", time.perf_counter() - start, words=n_words)
+
+    words[0].set_color(*TEXT_COLORS)
+    words[0].set_font(font_name, my_screen.textbox_height, 10)
+    size = Unit.metrics.size
+    Unit.metrics = FontMetrics(font_name, size, directory)  # empty cache: every word is measured
+    Unit.metrics.font = Unit.font
+    start = time.perf_counter()
+    compute_size_words(words)
+    timer.add("compute_size_words (cold)", time.perf_counter() - start, words=n_words)
+    start = time.perf_counter()
+    compute_size_words(words)
+    timer.add("compute_size_words (cached)", time.perf_counter() - start, words=n_words)
+
+    start = time.perf_counter()
+    screens, words = initialize(words, my_screen)
+    timer.add("initialize", time.perf_counter() - start, words=n_words)
+
+    path = os.path.join(directory, f"text_{n_words}.txt")  # plain text, one paragraph per line
+    with open(path, "w", encoding="utf-8") as text_file:
+        text_file.writelines(row["text"] + "\n" for row in data)
+    metrics = Unit.metrics
+    start = time.perf_counter()
+    screens, _ = open_text(path, my_screen, font_name, TEXT_COLORS)
+    timer.add("open_text (first screen)", time.perf_counter() - start, words=n_words)
+    start = time.perf_counter()
+    screens.load_all()
+    timer.add("open_text (rest of the text)", time.perf_counter() - start, words=n_words)
+    Unit.metrics = metrics
+    os.remove(path)
+
+    for density in densities:
+        screens, words = prepare(data, my_screen)
+        screens[0].memorybox.init_values(words)
+        DrawBox.current_max_y = 10
+        rnd = random.Random(density)
+        traces = [stroke_trace(s.drawbox_width, s.drawbox_height, density, rnd) for s in screens]
+        calls = sum(len(t) for t in traces)
+        start = time.perf_counter()
+        for screen, trace in zip(screens, traces):
+            old = (0, screen.drawbox_height)
+            for new in trace:
+                screen.drawbox.record_mouse(old, new)
+                old = new
+        timer.add("DrawBox.record_mouse", time.perf_counter() - start, calls, words=n_words, density=density)
+
+        start = time.perf_counter()
+        for screen in screens:
+            screen.drawbox.map_from_pixel()
+            screen.store_values()
+        timer.add("Screen.store_values", time.perf_counter() - start, len(screens), words=n_words, density=density)
+
+        memorybox = screens[0].memorybox
+        MemoryBox.current_max_y = MemoryBox.max_value
+        start = time.perf_counter()
+        for _ in range(10):
+            memorybox.show()
+        timer.add("MemoryBox.show", time.perf_counter() - start, 10, words=n_words, density=density)
+
+        words.metrics = None
+        start = time.perf_counter()
+        calculate_additional_properties(words)
+        timer.add("calculate_additional_properties", time.perf_counter() - start, words=n_words, density=density)
+
+        words.metrics = None
+        path = os.path.join(directory, f"results_{n_words}_{density}.csv")
+        start = time.perf_counter()
+        save_and_compress(words, 1, path)
+        timer.add("save_and_compress", time.perf_counter() - start, words=n_words, density=density)
+        os.remove(path)
+
+
+def startup_probe(text_name, snapshots):
+    """
+    One start of a session as in main.py, run in a fresh interpreter by bench_startup. Prints the wall clock time at
+    the end of every stage as json, the imports of this module are done when it is called.
+
+    Args:
+        text_name (str): the main text.
+        snapshots (bool): use the layout cache.
+    """
+    stamps = {}
+    import question_window  # noqa: F401 (only imported to time it, main.py imports it for the questionnaires)
+    stamps["imports"] = time.time()
+    my_screen = make_screen()
+    font_name = default_font()
+    screens, words = open_text(text_name, my_screen, font_name, TEXT_COLORS, snapshots=snapshots)
+    training_screens, _ = load_text(os.path.join(os.path.dirname(os.path.abspath(__file__)), TRAINING_TEXT),
+                                    my_screen, font_name, TEXT_COLORS, training=True, snapshots=snapshots)
+    surface = pygame.display.set_mode((SCR_WIDTH, SCR_HEIGHT))
+    training_screens[0].show(surface)
+    stamps["first frame"] = time.time()
+    screens.load_all()  # start_main_text of main.py, without the journal
+    line_save(words, "line_file.csv")
+    screens[0].memorybox.init_values(words)
+    screens[0].show(surface)
+    stamps["first screen of the text"] = time.time()
+    print(json.dumps(stamps))
+
+
+def bench_startup(timer, text_name, runs, directory):
+    """
+    Starts sessions in fresh interpreters (see startup_probe), in the directory: the font and layout caches are
+    written there by an untimed first start, as they would be by an earlier session.
+    """
+    text_name = os.path.abspath(text_name)
+    for snapshots in (False, True):
+        command = [sys.executable, os.path.abspath(__file__), "--startup-probe", text_name]
+        if snapshots:
+            command.append("--snapshots")
+        totals = {}
+        for run in range(runs + 1):
+            start = time.time()
+            output = subprocess.run(command, capture_output=True, text=True, check=True, cwd=directory).stdout
+            if run:
+                for stage, stamp in json.loads(output.splitlines()[-1]).items():
+                    totals[stage] = totals.get(stage, 0.) + stamp - start
+        for stage, seconds in totals.items():
+            timer.add(f"startup ({stage})", seconds, runs, text=os.path.basename(text_name), layout_cache=snapshots)
+
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def compare(results, baseline_file):
+    """
+    Prints the ratio new / old for every stage that is in both runs.
+    """
+    with open(baseline_file, encoding="utf-8") as b_file:
+        baseline = json.load(b_file)
+
+    def key(r):
+        return r["stage"], r.get("words"), r.get("density"), r.get("layout_cache")
+
+    old = {key(r): r for r in baseline["results"]}
+    print(f"\ncompared to {baseline.get('version') or baseline_file}:")
+    for r in results:
+        if key(r) in old and old[key(r)]["seconds"] > 0:
+            ratio = r["seconds"] / old[key(r)]["seconds"]
+            print(f"{r['stage']:<32} {str(key(r)[1:]):<16} {old[key(r)]['seconds']:9.4f} s -> "
+                  f"{r['seconds']:9.4f} s  x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmarks of the layout, drawing and export paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="words of the synthetic texts")
+    parser.add_argument("--densities", type=int, nargs="+", default=DENSITIES,
+                        help="pixels between two mouse moves")
+    parser.add_argument("--out", default="benchmark.json", help="json file for the results (default: benchmark.json)")
+    parser.add_argument("--compare", help="json file of an earlier run to compare against")
+    parser.add_argument("--startup-text", default="dummy_text.csv",
+                        help="main text of the startup benchmark (default: dummy_text.csv)")
+    parser.add_argument("--startup-runs", type=int, default=STARTUP_RUNS,
+                        help=f"starts per configuration, 0 to skip the startup benchmark (default: {STARTUP_RUNS})")
+    parser.add_argument("--startup-probe", help=argparse.SUPPRESS)  # used by bench_startup
+    parser.add_argument("--snapshots", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.startup_probe:
+        startup_probe(args.startup_probe, args.snapshots)
+        return
+
+    my_screen = make_screen()
+    font_name = default_font()
+    timer = Timer()
+    with tempfile.TemporaryDirectory() as directory:
+        if args.startup_runs > 0:
+            bench_startup(timer, args.startup_text, args.startup_runs, directory)
+        for n_words in args.sizes:
+            bench_size(timer, n_words, args.densities, my_screen, font_name, directory)
+    report = {"version": git_version(), "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "python": platform.python_version(), "pygame": pygame.version.ver, "numpy": np.__version__,
+              "machine": platform.platform(), "font": font_name, "results": timer.results}
+    with open(args.out, "w", encoding="utf-8") as out_file:
+        json.dump(report, out_file, indent=1)
+    print(f"results written to {args.out}")
+    if args.compare:
+        compare(timer.results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Columnar binary results.
+
+Every session is saved as one compressed .npz partition with typed columns: numbers as the smallest integer type
+or as floats, strings dictionary encoded (codes + categories). Next to the word columns (one row per drawn word, the
+same columns as in results.csv) a partition holds the drawn samples (row of the word, value, time).
+
+Usage as a script converts an existing results.csv (a header for every session) into partitions:
+    python columnar.py results.csv results_columnar
+"""
+import csv
+import os
+import re
+import sys
+
+import numpy as np
+
+CATEGORIES = "__categories"  # suffix of the array with the categories of a dictionary encoded column
+COLUMNS = "__columns"  # array with the names of the word columns, in order
+SAMPLES = ("sample_row", "sample_value", "sample_time")  # the sample columns of a partition
+
+
+def parse_value(value):
+    """
+    Turns a value read from csv back into a number or a bool (strings that are neither stay strings).
+    """
+    if not isinstance(value, str):
+        return value
+    if value in ("True", "False"):
+        return value == "True"
+    for number_type in (int, float):
+        try:
+            return number_type(value)
+        except ValueError:
+            pass
+    return value
+
+
+def encode_column(name, values):
+    """
+    Typed arrays for one column.
+
+    Args:
+        name (str): name of the column.
+        values (list): the values of the column, python objects or strings read from csv.
+
+    Returns:
+        dict: name -> array, strings additionally have name + CATEGORIES -> categories.
+    """
+    values = [parse_value(v) for v in values]
+    if all(isinstance(v, bool) for v in values):
+        return {name: np.array(values, dtype=bool)}
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        column = np.array(values, dtype=np.int64)
+        for int_type in (np.int8, np.int16, np.int32):
+            if not len(column) or (np.iinfo(int_type).min <= column.min() and column.max() <= np.iinfo(int_type).max):
+                return {name: column.astype(int_type)}
+        return {name: column}
+    if all(isinstance(v, (int, float)) or v == "" or v is None for v in values):
+        return {name: np.array([np.nan if v == "" or v is None else v for v in values], dtype=np.float64)}
+    categories, codes = np.unique(np.array(["" if v is None else str(v) for v in values]), return_inverse=True)
+    code_type = np.int8 if len(categories) < 2 ** 7 else np.int16 if len(categories) < 2 ** 15 else np.int32
+    return {name: codes.astype(code_type), name + CATEGORIES: categories}
+
+
+def write_partition(path, rows, samples=None):
+    """
+    Writes one session as a compressed .npz partition.
+
+    Args:
+        path (str): path of the partition file.
+        rows (list of dict): one dict per word row, all with the same keys.
+        samples (tuple, optional): arrays (row of the word, value, time), one entry per sample.
+    """
+    names = list(rows[0].keys()) if rows else []
+    arrays = {COLUMNS: np.array(names)}
+    for name in names:
+        arrays.update(encode_column(name, [row[name] for row in rows]))
+    if samples is not None:
+        arrays[SAMPLES[0]] = np.asarray(samples[0], dtype=np.int32)
+        arrays[SAMPLES[1]] = np.asarray(samples[1], dtype=np.float32)
+        arrays[SAMPLES[2]] = np.asarray(samples[2], dtype=np.float64)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez_compressed(path, **arrays)
+
+
+def read_partition(path):
+    """
+    Reads one partition.
+
+    Returns:
+        dict, dict: word columns (strings decoded) and sample columns (empty if the partition has none).
+    """
+    with np.load(path) as partition:
+        columns = {}
+        for name in partition[COLUMNS].tolist():
+            if name + CATEGORIES in partition:
+                columns[name] = partition[name + CATEGORIES][partition[name]].astype(object)
+            else:
+                columns[name] = partition[name]
+        samples = {name: partition[name] for name in SAMPLES if name in partition}
+    return columns, samples
+
+
+def load_study(directory):
+    """
+    Loads all partitions of a directory into one set of columns.
+
+    Columns that are missing in a partition are filled with empty values. The column "session" holds the name of the
+    partition, the sample column "sample_row" points to the rows of the combined word columns.
+
+    Returns:
+        dict, dict: word columns and sample columns of all sessions.
+    """
+    word_parts, sample_parts, names = [], [], []
+    offset = 0
+    for file_name in sorted(f for f in os.listdir(directory) if f.endswith(".npz")):
+        columns, samples = read_partition(os.path.join(directory, file_name))
+        n = len(next(iter(columns.values()))) if columns else 0
+        columns["session"] = np.full(n, os.path.splitext(file_name)[0], dtype=object)
+        names.extend(name for name in columns if name not in names)
+        word_parts.append(columns)
+        if samples:
+            samples = dict(samples)
+            samples["sample_row"] = samples["sample_row"].astype(np.int64) + offset
+            sample_parts.append(samples)
+        offset += n
+    words = {}
+    for name in names:
+        words[name] = np.concatenate([part[name] if name in part else
+                                      np.full(len(part["session"]), None, dtype=object) for part in word_parts]) \
+            if word_parts else np.empty(0)
+    samples = {name: np.concatenate([part[name] for part in sample_parts]) for name in SAMPLES} if sample_parts else {}
+    return words, samples
+
+
+def to_dataframe(columns):
+    """
+    Turns loaded columns into a pandas DataFrame, strings become categorical columns.
+    """
+    import pandas as pd  # only needed for analysis, not for the experiment
+    df = pd.DataFrame(columns)
+    for name in df.columns:
+        if df[name].dtype == object:
+            df[name] = df[name].astype("category")
+    return df
+
+
+def partition_name(directory, participant, c_round, stamp):
+    participant = re.sub(r"[^\w-]+", "_", str(participant)) or "session"
+    return os.path.join(directory, f"{participant}_{c_round}_{stamp}.npz")
+
+
+def iter_records(lines):
+    """
+    Joins physical lines into csv records (quoted fields, e.g. questionnaire answers, can contain line breaks).
+    """
+    record = ""
+    for line in lines:
+        record += line
+        if record.count('"') % 2 == 0:
+            yield record
+            record = ""
+    if record:
+        yield record
+
+
+def split_record(record, delimiter):
+    return next(csv.reader([record], delimiter=delimiter))
+
+
+def header_delimiter(record):
+    """
+    Returns the delimiter if the record is a session header of a result file, None otherwise.
+    save_and_compress writes headers with "," and a leading index column, fancy_save with ";".
+    """
+    if "screen_number" not in record:  # most records are rows, they are not parsed here
+        return None
+    for delimiter in (";", ","):
+        fields = split_record(record, delimiter) if record.strip() else []
+        if "text" in fields and "number" in fields and "screen_number" in fields:
+            return delimiter
+    return None
+
+
+def iter_session_records(csv_path):
+    """
+    Reads a result file session by session (a session starts with a repeated header), without parsing the rows.
+
+    Yields:
+        list, str, list of str: the header, its delimiter and the records of one session.
+    """
+    header, delimiter, records = None, None, []
+    with open(csv_path, newline="", encoding="utf-8-sig") as r_file:
+        for record in iter_records(r_file):
+            new_delimiter = header_delimiter(record)
+            if new_delimiter is not None:
+                if header is not None:
+                    yield header, delimiter, records
+                header, delimiter, records = split_record(record, new_delimiter), new_delimiter, []
+            elif header is not None and record.strip():
+                records.append(record)
+    if header is not None:
+        yield header, delimiter, records
+
+
+def parse_records(header, delimiter, records):
+    # the rows of a session, short rows are padded with empty fields
+    rows = []
+    for record in records:
+        row = split_record(record, delimiter)
+        rows.append(row + [""] * (len(header) - len(row)))
+    return rows
+
+
+def iter_sessions(csv_path):
+    """
+    Reads a result file session by session (a session starts with a repeated header).
+
+    Yields:
+        list, list of lists: the header and the rows of one session (the index column is dropped).
+    """
+    for header, delimiter, records in iter_session_records(csv_path):
+        yield header, parse_records(header, delimiter, records)
+
+
+def convert_results_csv(csv_path, directory):
+    """
+    Converts a results.csv into one partition per session.
+
+    Sessions written by fancy_save (one row per sample, with the columns "values" and "times") become word rows
+    with their samples.
+
+    Returns:
+        list: paths of the written partitions.
+    """
+    paths = []
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    for number, (header, rows) in enumerate(iter_sessions(csv_path)):
+        keep = [i for i, name in enumerate(header) if name != ""]  # the leftover index column
+        samples = None
+        if "values" in header and "times" in header:
+            value_index, time_index = header.index("values"), header.index("times")
+            keep = [i for i in keep if i not in (value_index, time_index)]
+            word_rows, sample_rows, sample_values, sample_times = [], [], [], []
+            for row in rows:
+                word_row = [row[i] for i in keep]
+                if not word_rows or word_rows[-1] != word_row:
+                    word_rows.append(word_row)
+                sample_rows.append(len(word_rows) - 1)
+                sample_values.append(float(row[value_index]))
+                sample_times.append(float(row[time_index]))
+            rows = word_rows
+            samples = (sample_rows, sample_values, sample_times)
+        else:
+            rows = [[row[i] for i in keep] for row in rows]
+        names = [header[i] for i in keep]
+        path = os.path.join(directory, f"{stem}_{number:05d}.npz")
+        write_partition(path, [dict(zip(names, row)) for row in rows], samples)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python columnar.py <results.csv> <output directory>")
+        sys.exit(1)
+    written = convert_results_csv(sys.argv[1], sys.argv[2])
+    print(f"{len(written)} sessions written to {sys.argv[2]}")
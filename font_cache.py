@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+
+import pygame
+
+CACHE_DIR = "font_cache"  # directory in which measured word sizes are kept between sessions
+
+
+def font_key(font_name):
+    """
+    Identify the font file behind a system font name.
+
+    Args:
+        font_name (str): Name of the font as given to pygame.font.SysFont, None for the default font.
+
+    Returns:
+        str: a file name friendly key that changes whenever the font file changes.
+    """
+    font_file = pygame.font.match_font(font_name) if font_name is not None else None
+    if font_file is None:  # pygame falls back to its built-in default font
+        font_file = pygame.font.get_default_font()
+        stamp = pygame.version.ver
+    else:
+        stat = os.stat(font_file)
+        stamp = f"{stat.st_size}-{stat.st_mtime_ns}"
+    digest = hashlib.sha1(f"{font_file}|{stamp}".encode("utf-8")).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(font_file))[0]
+    return f"{stem}_{digest}"
+
+
+class FontMetrics:
+    """
+    Sizes of text rendered in one font at one size.
+
+    Every distinct text is measured only once, the results are stored in a json file per font file and size,
+    so a new session with the same text and font does not need to touch the glyphs at all.
+
+    Attributes:
+        font_name (str): Name of the font as given to pygame.font.SysFont.
+        size (int): Font size.
+        path (str): The cache file for this font and size.
+        sizes (dict): text -> (width, height) of the rendered text.
+        changed (bool): True if there are measurements that are not saved to the cache file yet.
+    """
+    loaded = {}  # (font_name, size, cache_dir) -> FontMetrics, so each cache file is read once per session
+
+    def __init__(self, font_name, size, cache_dir=CACHE_DIR):
+        self.font_name = font_name
+        self.size = size
+        self.path = os.path.join(cache_dir, f"{font_key(font_name)}_{size}.json")
+        self.font = None  # the pygame font is only loaded if a text has to be measured
+        self.changed = False
+        try:
+            with open(self.path, encoding="utf-8") as cache_file:
+                self.sizes = {text: tuple(s) for text, s in json.load(cache_file).items()}
+        except (FileNotFoundError, ValueError):
+            self.sizes = {}
+
+    @classmethod
+    def get(cls, font_name, size, cache_dir=CACHE_DIR):
+        key = (font_name, size, cache_dir)
+        if key not in cls.loaded:
+            cls.loaded[key] = cls(font_name, size, cache_dir)
+        return cls.loaded[key]
+
+    def measure(self, text):
+        """
+        Size of a text in this font.
+
+        Args:
+            text (str): the text to be measured.
+
+        Returns:
+            tuple: (width, height) in pixels, the same as the rect of the rendered text.
+        """
+        s = self.sizes.get(text)
+        if s is None:
+            if self.font is None:
+                self.font = pygame.font.SysFont(self.font_name, self.size)
+            s = self.font.size(text)
+            self.sizes[text] = s
+            self.changed = True
+        return s
+
+    def save(self):
+        """
+        Writes new measurements to the cache file.
+        """
+        if not self.changed:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as cache_file:
+            json.dump(self.sizes, cache_file, ensure_ascii=False)
+        os.replace(temporary, self.path)  # never leave a half written cache behind
+        self.changed = False
@@ -0,0 +1,275 @@
+"""
+Crash-safe session journal.
+
+While a session runs, every stroke (one mouse move on the drawing box), every deletion and every screen commit
+(the values and times stored with the words when a screen is left) is appended to a binary journal file. The records
+are packed and written by a background thread, so the main loop only puts a tuple into a queue. Writes are buffered,
+on every commit the file is flushed and synced to disk.
+
+A journal starts with the layout of the words, so the results can be rebuilt without the text file and fonts.
+Usage as a script rebuilds the standard export from a journal (also of sessions that ended in a crash):
+    python journal.py journals/session_1700000000.journal results_recovered.csv
+
+Record layout: type (1 byte), payload length (4 bytes), crc32 of the payload (4 bytes), payload.
+"""
+import atexit
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import zlib
+
+import numpy as np
+
+MAGIC = b"SUSJRNL1"  # first bytes of every journal file
+HEADER = struct.Struct("<BII")  # record type, payload length, crc32 of the payload
+STROKE = struct.Struct("<idddddq")  # screen, old x, old y, new x, new y, zoom, time (ns)
+SCREEN = struct.Struct("<iI")  # screen, number of samples that follow (commit) or 0 (delete)
+
+BEGIN, PROPERTIES, STROKE_RECORD, DELETE, COMMIT, END = range(1, 7)  # record types
+
+
+class Journal:
+    """
+    Append-only journal of one session, written by a background thread.
+
+    Attributes:
+        path (str): path of the journal file.
+        records (queue.SimpleQueue): records waiting to be written, (type, data) tuples.
+        writer (threading.Thread): the thread that packs and writes the records.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.file = open(path, "ab", buffering=1 << 16)
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.records = queue.SimpleQueue()
+        self.closed = False
+        self.writer = threading.Thread(target=self.write_records, name="journal", daemon=True)
+        self.writer.start()
+        atexit.register(self.close)  # records still in the queue are written when the program exits
+
+    def begin(self, words, c_round, wall_anchor, counter_anchor, drawbox_height, drawbox_width):
+        """
+        Records the start of a session: the layout of all words and what is needed to turn strokes into values.
+
+        Args:
+            words (WordTable): all words of the text, with their layout and properties.
+            c_round (int): number of the text in the experiment.
+            wall_anchor (float): SessionClock.wall_anchor of the session.
+            counter_anchor (int): SessionClock.counter_anchor of the session.
+            drawbox_height (int): height of the drawing box in pixels.
+            drawbox_width (int): width of the drawing box in pixels.
+        """
+        session = {"c_round": c_round, "wall_anchor": wall_anchor, "counter_anchor": counter_anchor,
+                   "drawbox_height": drawbox_height, "drawbox_width": drawbox_width,
+                   "words": words.to_columns()}
+        self.records.put((BEGIN, session))
+
+    def properties(self, properties):
+        """
+        Records properties of the session (e.g. the answers of a questionnaire).
+        """
+        self.records.put((PROPERTIES, dict(properties)))
+
+    def stroke(self, screen, old, new, max_y, now):
+        """
+        Records one mouse move on the drawing box of a screen (the arguments of DrawBox.record_mouse).
+
+        Args:
+            screen (int): number of the screen.
+            old (tuple): last point (x, y) in pixels.
+            new (tuple): new point (x, y) in pixels.
+            max_y (float): the zoom (DrawBox.current_max_y) the pixels refer to.
+            now (int): SessionClock time of the move.
+        """
+        self.records.put((STROKE_RECORD, (screen, old[0], old[1], new[0], new[1], max_y, now)))
+
+    def delete(self, screen):
+        self.records.put((DELETE, screen))
+
+    def commit(self, screen, values, times):
+        """
+        Records the values stored with the words of a screen. The journal is synced to disk once it is written.
+
+        Args:
+            screen (int): number of the screen.
+            values (np.ndarray): pairs of (x, value), as in DrawBox.values.
+            times (np.ndarray): unix time stamps of the values, as in DrawBox.times.
+        """
+        self.records.put((COMMIT, (screen, values, times)))
+
+    def end(self):
+        self.records.put((END, None))
+
+    def close(self):
+        """
+        Writes the remaining records and closes the file.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.records.put(None)
+        self.writer.join()
+
+    def write_records(self):
+        while True:
+            record = self.records.get()
+            if record is None:
+                break
+            record_type, data = record
+            payload = pack(record_type, data)
+            self.file.write(HEADER.pack(record_type, len(payload), zlib.crc32(payload)))
+            self.file.write(payload)
+            if record_type in (COMMIT, END):
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            elif self.records.empty():  # hand everything to the system when the main loop is idle
+                self.file.flush()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+
+def pack(record_type, data):
+    if record_type in (BEGIN, PROPERTIES):
+        return json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+    if record_type == STROKE_RECORD:
+        return STROKE.pack(*data)
+    if record_type == DELETE:
+        return SCREEN.pack(data, 0)
+    if record_type == COMMIT:
+        screen, values, times = data
+        return SCREEN.pack(screen, len(times)) + np.ascontiguousarray(values, dtype="<f8").tobytes() + \
+            np.ascontiguousarray(times, dtype="<f8").tobytes()
+    return b""
+
+
+def unpack(record_type, payload):
+    if record_type in (BEGIN, PROPERTIES):
+        return json.loads(payload.decode("utf-8"))
+    if record_type == STROKE_RECORD:
+        return STROKE.unpack(payload)
+    if record_type == DELETE:
+        return SCREEN.unpack(payload)[0]
+    if record_type == COMMIT:
+        screen, n = SCREEN.unpack_from(payload)
+        values = np.frombuffer(payload, dtype="<f8", count=2 * n, offset=SCREEN.size).reshape(n, 2)
+        times = np.frombuffer(payload, dtype="<f8", count=n, offset=SCREEN.size + 16 * n)
+        return screen, values, times
+    return None
+
+
+def read_journal(path):
+    """
+    Reads the records of a journal. Reading stops at the first incomplete or damaged record
+    (the end of a journal whose session crashed while it was written).
+
+    Yields:
+        tuple: (record type, data)
+    """
+    with open(path, "rb") as j_file:
+        if j_file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a journal")
+        while True:
+            header = j_file.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            record_type, length, crc = HEADER.unpack(header)
+            payload = j_file.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return
+            yield record_type, unpack(record_type, payload)
+
+
+def recover(path):
+    """
+    Rebuilds the words of a session with their values and times from a journal.
+
+    Committed screens get exactly the values that were stored when they were left. If the session did not end
+    normally, the strokes on screens that were not committed (the screen the session broke off on) are replayed on
+    a drawing box and stored the same way. The words of committed screens are checked, on the other screens the
+    words that the strokes went past since the screen was last deleted (as Screen.check_words does while drawing).
+
+    Args:
+        path (str): path of the journal.
+
+    Returns:
+        WordTable, int, bool: the words, the number of the text in the experiment and whether the session ended
+        normally.
+    """
+    from units import DrawBox, SessionClock, assign_samples, index_screens  # pygame is only needed for recovering
+
+    session, words, ranges, boxes, finished = None, None, [], {}, False
+    reach = {}  # screen -> the furthest x of its strokes since it was last deleted
+    for record_type, data in read_journal(path):
+        if record_type == BEGIN:
+            session = data
+            SessionClock.wall_anchor = session["wall_anchor"]
+            SessionClock.counter_anchor = session["counter_anchor"]
+            words = session_words(session)
+            ranges = index_screens(words)
+        elif session is None:
+            continue
+        elif record_type == PROPERTIES:
+            words.session_properties.update(data)
+        elif record_type == STROKE_RECORD:
+            screen, old_x, old_y, new_x, new_y, max_y, now = data
+            if screen not in boxes:
+                boxes[screen] = DrawBox(current_mx=max_y, mx=1000, mn=0.1, height=session["drawbox_height"],
+                                        width=session["drawbox_width"], background_color=None, text_color=None,
+                                        line_color=None, font=None)
+            DrawBox.current_max_y = max_y
+            boxes[screen].record_mouse((int(old_x), old_y), (int(new_x), new_y), now)
+            reach[screen] = max(reach.get(screen, 0), new_x)
+        elif record_type == DELETE:
+            boxes.pop(data, None)
+            reach.pop(data, None)
+            words.uncheck(*screen_range(ranges, data))
+        elif record_type == COMMIT:
+            screen, values, times = data
+            boxes.pop(screen, None)
+            assign_samples(words, *screen_range(ranges, screen), values, times)
+            start, stop = screen_range(ranges, screen)
+            words.columns["checked"][start:stop] = True  # a screen can only be left when all its words are checked
+        elif record_type == END:
+            finished = True
+    if session is None:
+        raise ValueError(f"{path} does not contain the start of a session")
+    if not finished:
+        for screen, box in boxes.items():
+            box.map_from_pixel()
+            assign_samples(words, *screen_range(ranges, screen), box.values, box.times)
+    for screen, x in reach.items():
+        words.check(*screen_range(ranges, screen), (x, 0))
+    return words, session["c_round"], finished
+
+
+def session_words(session):
+    """
+    The words of a session as laid out when it started (from the BEGIN record), without values.
+    """
+    from units import WordTable
+
+    return WordTable.from_columns(session["words"])
+
+
+def screen_range(ranges, screen):
+    # (start, stop) of the words of a screen, (0, 0) for a screen that does not exist
+    return ranges[screen] if 0 <= screen < len(ranges) else (0, 0)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python journal.py <journal> <results.csv>")
+        sys.exit(1)
+    from units import save_and_compress
+
+    recovered, c_round, complete = recover(sys.argv[1])
+    save_and_compress(recovered, c_round, sys.argv[2])
+    print(f"{int((recovered.samples.counts() > 0).sum())} drawn words written to {sys.argv[2]}"
+          + ("" if complete else " (the session did not end normally)"))
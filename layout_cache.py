@@ -0,0 +1,104 @@
+"""
+Layout snapshots.
+
+The layout of a text (word sizes, positions, lines, screens and cumulative offsets) only depends on the text, the font
+and the geometry of the text box. It is computed once and stored as a snapshot: a directory with one .npy file per
+column and a json file with the vocabulary, the paragraph properties, the screens and the font size. The name of the
+directory is a hash of all inputs, so a changed text file, font file or geometry gives a new snapshot and an outdated
+one is never used (old snapshots can simply be deleted). Snapshots are loaded memory-mapped: only the pages that are
+read are loaded, and a column that is changed during a session (e.g. the checked words) is copied on write.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from font_cache import font_key
+
+CACHE_DIR = "layout_cache"  # directory in which the layout snapshots are kept between sessions
+VERSION = 1  # part of every key: raise it when the layout or the snapshot format changes
+
+
+def file_digest(path):
+    # sha1 of the content of a file, read in blocks
+    digest = hashlib.sha1()
+    with open(path, "rb") as text_file:
+        for block in iter(lambda: text_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def snapshot_key(text_name, font_name, textbox_width, textbox_height, number_of_lines, training,
+                 unit_delimiter=" "):
+    """
+    Identify the layout of a text.
+
+    Args:
+        text_name (str): path of the text file.
+        font_name (str): Name of the font as given to pygame.font.SysFont.
+        textbox_width (int): width of the text box in pixels.
+        textbox_height (int): height of the text box in pixels.
+        number_of_lines (int): number of lines per screen.
+        training (bool): a new screen for every paragraph.
+        unit_delimiter (str, optional): the delimiter between two words. Defaults to " ".
+
+    Returns:
+        str: a key that changes whenever one of the inputs of the layout changes.
+    """
+    inputs = [VERSION, file_digest(text_name), font_key(font_name), textbox_width, textbox_height, number_of_lines,
+              training, unit_delimiter]
+    return hashlib.sha1(json.dumps(inputs).encode("utf-8")).hexdigest()[:16]
+
+
+def load_snapshot(key, cache_dir=CACHE_DIR):
+    """
+    Reads a layout snapshot.
+
+    Args:
+        key (str): the key of the layout (see snapshot_key).
+        cache_dir (str, optional): directory of the snapshots. Defaults to CACHE_DIR.
+
+    Returns:
+        dict: the json data of the snapshot and its columns in "arrays" (name -> memory-mapped array, copy on write),
+        None if there is no snapshot for the key.
+    """
+    path = os.path.join(cache_dir, key)
+    try:
+        with open(os.path.join(path, "snapshot.json"), encoding="utf-8") as s_file:
+            snapshot = json.load(s_file)
+        snapshot["arrays"] = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="c")
+                              for name in snapshot["arrays"]}
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
+    return snapshot
+
+
+def save_snapshot(key, arrays, data, cache_dir=CACHE_DIR):
+    """
+    Writes a layout snapshot, unless there is one for the key already.
+
+    Args:
+        key (str): the key of the layout (see snapshot_key).
+        arrays (dict): column name -> numpy.ndarray.
+        data (dict): everything else, must be json serializable.
+        cache_dir (str, optional): directory of the snapshots. Defaults to CACHE_DIR.
+
+    Returns:
+        str: path of the snapshot.
+    """
+    path = os.path.join(cache_dir, key)
+    if os.path.isdir(path):
+        return path
+    temporary = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(temporary, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(temporary, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(temporary, "snapshot.json"), "w", encoding="utf-8") as s_file:
+        json.dump(dict(data, arrays=list(arrays)), s_file, ensure_ascii=False, default=str)
+    try:
+        os.replace(temporary, path)  # never leave a half written snapshot behind
+    except OSError:  # another session wrote the same snapshot in the meantime
+        shutil.rmtree(temporary, ignore_errors=True)
+    return path
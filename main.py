@@ -1,9 +1,11 @@
 from units import *
 from auxiliaries import *
 from question_window import *
+from journal import Journal
+from profiler import Profiler
 
 # global parameters - mess with these even if you do not know what you are doing and you will be happy.
-CSV_NAME = "dummy_text.csv"  # csv file must have at least one column named "text"
+CSV_NAME = "dummy_text.csv"  # csv file with at least one column named "text", or .txt (a paragraph per line)
 training_csv = "training_texts_english.csv"  # csv for training phase
 training_phase = True  # set to false if you want to skip training
 questionaire = True  # set to true if you want to show the questionnaire
@@ -11,6 +13,12 @@ try_it = False  # set to true if you want only a short passage to try out the pr
 SCR_WIDTH = 1920
 SCR_HEIGHT = 1080
 count_round = 1  # one as this version of the experiment has just one text
+DIRTY_RECTS = True  # set to false to update the whole display for every mouse move
+FRAME_RATE = 60  # refresh rate of the display: the screen is never drawn more often than this
+JOURNAL_DIR = "journals"  # every session is journaled here while it runs (set to None to switch off)
+PROFILE = False  # set to true to write a report of frame and stage times (performance_<time>.csv) next to results.csv
+LAYOUT_SNAPSHOTS = True  # keep the layout of the texts in layout_cache/, a text is only laid out again if it changes
+COLUMNAR_DIR = None  # set to a directory (e.g. "results_columnar") to also save every session as a compressed .npz
 
 # screen proportions
 TXT_HEIGHT = 35  # percent of screen height
@@ -46,44 +54,40 @@ key_map = {next_line: "forward", previous_line: "backward", zoom_out: "out", zoo
 
 pygame.init()
 pygame.mixer.init()
+SessionClock.start()
 error_sound = pygame.mixer.Sound("printer_sound.wav")
 font_name = pygame.font.get_fonts()[0]  # change this if you do not like the font!!
 my_screen = Screen(SCR_HEIGHT, TXT_HEIGHT, SCR_WIDTH, TXT_WIDTH, TXT_Y, TXT_X, SUSPENSE_HEIGHT, SUSPENSE_SPACE,
                    drawbox_background=BACKGROUND_COLOR, drawbox_text=SUSPENSE_RANGE_COLOR, drawbox_line=SUSPENSE_COLOR,
                    textbackground=TEXT_BACKGROUND_COLOR, memory_size=MEMORY_HEIGHT)
-my_data = import_csv(CSV_NAME)
-my_words = get_words(my_data)
-my_words[0].set_color(TEXT_COLOR_1, TEXT_COLOR_2)
-my_words[0].set_font(font_name, my_screen.textbox_height, 10)
-compute_size_words(my_words)
-my_screens, my_words = initialize(my_words, my_screen)
-line_save(my_words, "line_file_cats.csv")
+Screen.dirty_updates = DIRTY_RECTS
+# only the first screen of the main text is read now, the rest is read in the idle time of the training
+my_screens, my_words = open_text(CSV_NAME, my_screen, font_name, (TEXT_COLOR_1, TEXT_COLOR_2),
+                                 snapshots=LAYOUT_SNAPSHOTS)
 # print(my_screens)
 # initialize Training screens in a similar way!
 
-training_data = import_csv(training_csv)
-training_words = get_words(training_data)
-training_words[0].set_color(TEXT_COLOR_1, TEXT_COLOR_2)
-training_words[0].set_font(font_name, my_screen.textbox_height, 10)
-compute_size_words(training_words)
-training_screens, training_words = initialize(training_words, my_screen, training=True)
+training_screens, training_words = load_text(training_csv, my_screen, font_name, (TEXT_COLOR_1, TEXT_COLOR_2),
+                                             training=True, snapshots=LAYOUT_SNAPSHOTS)
 # print(training_screens)
 
-my_screens[0].memorybox.init_values(my_words)
-
-# initialize allowed keys for the main session
-for screen in my_screens:
+# initialize allowed keys for the main session (screens are built when they are needed, the settings are applied then)
+def main_settings(screen):
     for key in [next_line, previous_line, zoom_in, zoom_out, delete_line, exit_key]:
         screen.set_allowed_key(key)
         screen.allow_mouse = True
 
 
-for screen in training_screens:  # for the training, different keys are allowed on different training stages
+def training_settings(screen):  # for the training, different keys are allowed on different training stages
     for key in [next_line, previous_line]:
         screen.set_allowed_key(key)
         screen.allow_mouse = False
     screen.memorybox.training = True
 
+
+my_screens.configure(main_settings)
+training_screens.configure(training_settings)
+
 mouse_training = [1, 3, 4, 5, 6, 7]  # in these screens, the mouse can (and must) be moved.
 for m in mouse_training:
     training_screens[m].allow_mouse = True
@@ -99,9 +103,32 @@ meta.display_questions()
 meta.window.attributes("-topmost", True)
 meta.window.mainloop()
 
-for w in my_words:
-    for i in range(len(meta.question_list)):
-        w.properties[meta.question_list[i]["text"]] = meta.question_list[i]["result"]
+# the answers are stored once for the session, they are added to every row of the results when these are written
+my_words.session_properties.update({q["text"]: q["result"] for q in meta.question_list})
+
+
+def start_main_text():
+    """
+    Prepares everything that needs the whole main text before it is shown: the rest of the text is read, the lines
+    are saved, the memory box gets a place for every word and the journal starts with the layout of all words.
+
+    Returns:
+        Journal: the journal of the session (None if journaling is switched off).
+    """
+    my_screens.load_all()
+    line_save(my_words, "line_file_cats.csv")
+    my_screens[0].memorybox.init_values(my_words)
+    if JOURNAL_DIR is None:
+        return None
+    # strokes and finished screens are saved while drawing, see journal.py for recovery
+    session_journal = Journal(os.path.join(JOURNAL_DIR, f"session_{int(SessionClock.wall_anchor)}.journal"))
+    session_journal.begin(my_words, count_round, SessionClock.wall_anchor, SessionClock.counter_anchor,
+                          my_screen.drawbox_height, my_screen.drawbox_width)
+    my_screens.configure(lambda screen: setattr(screen, "journal", session_journal))
+    return session_journal
+
+
+journal = None
 
 display_surface = pygame.display.set_mode((SCR_WIDTH, SCR_HEIGHT))
 display_surface.fill(BACKGROUND_COLOR)
@@ -111,22 +138,36 @@ if training_phase:
     current_screen = training_screens[0]
     run = 0
 elif try_it:
+    journal = start_main_text()
     current_screen = my_screens[-3]  # set this to "training_screens[0] to start at the beginning"
     run = 1
 else:
+    journal = start_main_text()
     current_screen = my_screens[0]
     run = 1
 
+if PROFILE:
+    Profiler.start()
+clock = pygame.time.Clock()
 while run < 2:
     should_stop = False  # this turns true if the last screen is met or the game is quit. It helps escape the loop.
     # print("next screen", current_screen.next_screen)
     assert isinstance(current_screen, Screen)
-    mouse_old_x, mouse_old_y = pygame.mouse.get_pos()
     while not should_stop:
         if not current_screen.shown:
+            clock.tick(FRAME_RATE)  # never draw more often than the display can show
             current_screen.show(display_surface)
-            pygame.mouse.set_pos(current_screen.set_mouse())
-        for event in pygame.event.get():
+            mouse_target = tuple(int(c) for c in current_screen.set_mouse())
+            if pygame.mouse.get_pos() != mouse_target:
+                pygame.mouse.set_pos(mouse_target)
+        events = pygame.event.get()
+        if not events:  # nothing happened: read on in the main text, or sleep until the next event instead of polling
+            if my_screens.load():
+                continue
+            events = [pygame.event.wait()]
+        if Profiler.enabled:
+            events_start = time.perf_counter_ns()
+        for event in events:
             if event.type == pygame.KEYDOWN:
                 if event.key in current_screen.allowed_keys:
                     next = current_screen.action(key_map[event.key])
@@ -135,6 +176,7 @@ while run < 2:
                     elif next == "no next screen found" or next == "getout":
                         run += 1
                         if run == 1:
+                            journal = start_main_text()
                             DrawBox.current_max_y = 10
                             current_screen = my_screens[0]
                             current_screen.last_mouse_position_absolute = (current_screen.drawbox_x,
@@ -155,24 +197,12 @@ while run < 2:
                     # quit the program.
                     should_stop = True
                     break
-            if pygame.mouse.get_pos() != (mouse_old_x, mouse_old_y):  # did the mouse move?
-                if pygame.mouse.get_pressed() == (1, 0, 0):
-                    mouse_x, mouse_y = pygame.mouse.get_pos()
-                    # first check if the mouse is in the box
-                    if current_screen.drawbox_x <= mouse_x <= current_screen.drawbox_width + current_screen.drawbox_x and \
-                            current_screen.drawbox_y <= mouse_y <= current_screen.drawbox_height + current_screen.drawbox_y:
-                        mouse_x = mouse_x - current_screen.drawbox_x
-                        mouse_y = mouse_y - current_screen.drawbox_y
-                        if mouse_x >= current_screen.get_mouse()[0]:
-                            if current_screen.allow_mouse:
-                                current_screen.drawbox.record_mouse(current_screen.get_mouse(), (mouse_x, mouse_y))
-                                current_screen.change_last_mouse((mouse_x, mouse_y))
-                                current_screen.shown = False
-                                mouse_old_x, mouse_old_y = pygame.mouse.get_pos()
-                        else:
-                            pygame.mouse.set_pos(current_screen.set_mouse())
-                else:
+            elif event.type == pygame.MOUSEMOTION:
+                # every queued mouse position is drawn, not only the one that is current when the queue is read
+                if not current_screen.mouse_input(event.pos, event.buttons):
                     pygame.mouse.set_pos(current_screen.set_mouse())
+        if Profiler.enabled and not should_stop:
+            Profiler.lap("events", events_start)
 
 questions = read_in_questions("questionaire2")
 qu_1 = QuestionWindow("Fragebogen Teil 1", questions[0])
@@ -181,12 +211,21 @@ qu_1.window.mainloop()
 qu_2 = QuestionWindow("Fragebogen Teil 2", questions[1])
 qu_2.display_questions(multiline=True)
 qu_2.window.mainloop()
-for w in my_words:
-    for i in range(len(qu_1.question_list)):
-        w.properties[qu_1.question_list[i]["text"]] = qu_1.question_list[i]["result"]
-    for i in range(len(qu_2.question_list)):
-        w.properties[qu_2.question_list[i]["text"]] = qu_2.question_list[i]["result"]
+my_words.session_properties.update({q["text"]: q["result"] for q in qu_1.question_list + qu_2.question_list})
+if journal is not None:
+    journal.properties({q["text"]: q["result"] for q in qu_1.question_list + qu_2.question_list})
 init_thanks()
+if Profiler.enabled:
+    save_start = time.perf_counter_ns()
 save_and_compress(my_words, count_round, "results.csv")
+if Profiler.enabled:
+    Profiler.lap("save", save_start)
+if COLUMNAR_DIR is not None:
+    save_columnar(my_words, count_round, COLUMNAR_DIR)
+if Profiler.enabled:
+    Profiler.write_report(f"performance_{int(SessionClock.wall_anchor)}.csv")
+if journal is not None:
+    journal.end()
+    journal.close()
 pygame.time.wait(100)
 exit()
@@ -0,0 +1,121 @@
+"""
+Stage profiler for live sessions.
+
+If switched on (PROFILE in main.py), the main loop and Screen.show time their stages: event handling, record_mouse,
+the show of the drawing box and the memory box, the text, display.update, whole frames, screen commits and saving.
+Every stage has a histogram with four buckets per power of two nanoseconds, so recording a timing costs one clock
+read and a few integer operations, and memory does not grow with the length of the session. At the end of a session
+the histograms are written as a csv report (count, mean, percentiles and max per stage).
+"""
+import csv
+import time
+
+SUB_BUCKETS = 4  # buckets per power of two
+N_BUCKETS = 64 * SUB_BUCKETS
+
+
+def bucket(ns):
+    # index of the histogram bucket of a duration in nanoseconds
+    bits = ns.bit_length()
+    if bits < 3:
+        return ns
+    return (bits - 2) * SUB_BUCKETS + ((ns >> (bits - 3)) & (SUB_BUCKETS - 1))
+
+
+def bucket_limit(index):
+    # the largest duration that falls into a bucket
+    if index < SUB_BUCKETS:
+        return index
+    bits = index // SUB_BUCKETS + 2
+    return ((SUB_BUCKETS + index % SUB_BUCKETS + 1) << (bits - 3)) - 1
+
+
+class Histogram:
+    """
+    Durations of one stage.
+
+    Attributes:
+        counts (list of int): number of durations per bucket.
+        n (int): number of durations.
+        total (int): sum of the durations in nanoseconds.
+        max (int): longest duration in nanoseconds.
+    """
+
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.n = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, ns):
+        self.counts[bucket(ns)] += 1
+        self.n += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, p):
+        """
+        Upper limit of the bucket that holds the p-th percentile (at most a quarter of its power of two too high).
+        """
+        rank = p / 100 * self.n
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(bucket_limit(index), self.max)
+        return self.max
+
+
+class Profiler:
+    """
+    The histograms of the running session, shared by all screens.
+
+    Usage in timed code:
+        if Profiler.enabled:
+            t = time.perf_counter_ns()
+        ...
+        if Profiler.enabled:
+            t = Profiler.lap("stage", t)
+    """
+    enabled = False  # set to True to time the stages of the session
+    stages = {}  # stage name -> Histogram, in the order the stages were first timed
+
+    @classmethod
+    def start(cls):
+        cls.enabled = True
+        cls.stages = {}
+
+    @classmethod
+    def lap(cls, stage, start):
+        """
+        Adds the time since start to a stage.
+
+        Args:
+            stage (str): name of the stage.
+            start (int): time.perf_counter_ns() at the start of the stage.
+
+        Returns:
+            int: the current time.perf_counter_ns(), the start of the next stage.
+        """
+        now = time.perf_counter_ns()
+        histogram = cls.stages.get(stage)
+        if histogram is None:
+            histogram = cls.stages[stage] = Histogram()
+        histogram.add(now - start)
+        return now
+
+    @classmethod
+    def write_report(cls, report_file):
+        """
+        Writes one row per stage: count, mean, percentiles and max in milliseconds, and the filled buckets.
+        """
+        with open(report_file, "w", newline="") as r_file:
+            writer = csv.writer(r_file, dialect="excel", delimiter=";")
+            writer.writerow(["stage", "count", "total_ms", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms",
+                             "buckets (upper limit in us: count)"])
+            for stage, h in cls.stages.items():
+                buckets = " ".join(f"{bucket_limit(i) / 1e3:.1f}:{c}" for i, c in enumerate(h.counts) if c)
+                writer.writerow([stage, h.n, round(h.total / 1e6, 3), round(h.total / max(h.n, 1) / 1e6, 4)] +
+                                [round(h.percentile(p) / 1e6, 4) for p in (50, 90, 99)] +
+                                [round(h.max / 1e6, 4), buckets])
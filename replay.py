@@ -0,0 +1,276 @@
+"""
+Headless replay of sessions.
+
+A session is run without a person at the mouse and without any window: mouse moves and key presses go through the
+same Screen methods as in main.py (Screen.mouse_input, Screen.action) and the results are saved with
+save_and_compress. SDL runs with its dummy video and audio drivers, nothing waits for a frame or an event, so
+sessions run as fast as the CPU allows. With --render every frame is drawn on the dummy display as well.
+
+Usage:
+    python replay.py journal journals/session_1700000000.journal replayed.csv
+    python replay.py synthetic 1000 load_test.csv --workers 4
+Recorded sessions come from a journal (see journal.py). Synthetic participants draw a random line over every
+screen, now and then they zoom or delete a screen.
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # no window, must be set before pygame starts its display
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from units import *
+from journal import BEGIN, COMMIT, DELETE, END, PROPERTIES, STROKE_RECORD, read_journal, session_words
+
+# the layout of main.py
+SCR_WIDTH = 1920
+SCR_HEIGHT = 1080
+TXT_HEIGHT = 35
+TXT_WIDTH = 80
+TXT_Y = 45
+TXT_X = 10
+SUSPENSE_HEIGHT = 35
+SUSPENSE_SPACE = 5
+MEMORY_HEIGHT = 15
+TEXT_COLORS = ((100, 100, 0), (100, 0, 100))
+STEP_NS = 8_000_000  # time between two mouse moves of a synthetic participant
+
+
+def make_screen():
+    # the screen used for the layout, as in main.py
+    pygame.init()
+    return Screen(SCR_HEIGHT, TXT_HEIGHT, SCR_WIDTH, TXT_WIDTH, TXT_Y, TXT_X, SUSPENSE_HEIGHT, SUSPENSE_SPACE,
+                  drawbox_background=(228, 221, 221), drawbox_text=(0, 0, 0), drawbox_line=(108, 25, 25),
+                  textbackground=(228, 238, 238), memory_size=MEMORY_HEIGHT)
+
+
+def default_font():
+    fonts = pygame.font.get_fonts()
+    return fonts[0] if fonts else "freesans"
+
+
+class Replay:
+    """
+    Drives one session through the screens, event by event.
+
+    Events are tuples: ("move", position, now) for a mouse move with the left button pressed (absolute position on
+    the display, SessionClock time), ("key", action) for an allowed key (an action of Screen.action),
+    ("goto", screen number) to continue on another screen and ("properties", dict) for properties of the session.
+
+    Attributes:
+        screens (Screens): the screens of the session.
+        words (WordTable): the words of the session.
+        current (Screen): the screen that is shown.
+        surface (pygame.Surface): the display every frame is drawn on, None to skip drawing.
+        events (int): number of events processed.
+        errors (int): number of key presses that would have played the error sound.
+        finished (bool): True once the last screen was left.
+    """
+
+    def __init__(self, screens, words, surface=None):
+        self.screens = screens
+        self.words = words
+        self.current = screens[0]
+        self.surface = surface
+        self.events = 0
+        self.errors = 0
+        self.finished = False
+        DrawBox.current_max_y = 10
+        Screen.on_display = None
+        screens[0].memorybox.init_values(words)
+
+    def move(self, position, now=None):
+        self.current.mouse_input(position, (1, 0, 0), now)  # a mouse that is put back simply stays where it was
+
+    def key(self, action):
+        self.current.check_words()  # done by Screen.show in every frame of a real session
+        result = self.current.action(action)
+        if result == "play_error":
+            self.errors += 1
+        elif result in ("no next screen found", "getout"):
+            self.finished = True
+        else:
+            self.current = result
+
+    def goto(self, number):
+        self.current = self.current.hand_over(self.screens[number])
+
+    def properties(self, properties):
+        self.words.session_properties.update(properties)
+
+    def run(self, events):
+        """
+        Processes events until they run out or the session is finished.
+
+        Args:
+            events (iterable of tuple): the events, a generator may look at the state of the replay.
+
+        Returns:
+            Replay: self
+        """
+        handlers = {"move": self.move, "key": self.key, "goto": self.goto, "properties": self.properties}
+        for kind, *arguments in events:
+            handlers[kind](*arguments)
+            self.events += 1
+            if self.surface is not None and not self.current.shown:
+                self.current.show(self.surface)
+            if self.finished:
+                break
+        return self
+
+
+def journal_events(replay, records):
+    """
+    Turns the records of a journal into events. Zoom changes are replayed as key presses before the next stroke.
+
+    Args:
+        replay (Replay): the replay the events are for.
+        records (iterable of tuple): records after the BEGIN record, as returned by read_journal.
+    """
+    for record_type, data in records:
+        if record_type == STROKE_RECORD:
+            screen, old_x, old_y, new_x, new_y, max_y, now = data
+            if screen != replay.current.number:
+                yield "goto", screen
+            while DrawBox.current_max_y < max_y and DrawBox.current_max_y < DrawBox.max_y:
+                yield "key", "in"
+            while DrawBox.current_max_y > max_y and DrawBox.current_max_y > DrawBox.min_y:
+                yield "key", "out"
+            yield "move", (int(new_x) + replay.current.drawbox_x, int(new_y) + replay.current.drawbox_y), now
+        elif record_type == DELETE:
+            yield "key", "delete"
+        elif record_type == COMMIT:
+            yield "key", "forward"
+        elif record_type == PROPERTIES:
+            yield "properties", data
+        elif record_type == END:
+            return
+
+
+def replay_journal(path, surface=None):
+    """
+    Replays a recorded session from its journal, with the layout and clock of the recorded session.
+
+    Returns:
+        Replay, int: the finished replay (its words carry the replayed values) and the number of the text in the
+        experiment.
+    """
+    records = read_journal(path)
+    for record_type, session in records:
+        if record_type == BEGIN:
+            break
+    else:
+        raise ValueError(f"{path} does not contain the start of a session")
+    my_screen = make_screen()
+    words = session_words(session)
+    words[0].set_color(*TEXT_COLORS)
+    words[0].set_font(default_font(), my_screen.textbox_height, 10)  # only needed to draw
+    SessionClock.wall_anchor = session["wall_anchor"]
+    SessionClock.counter_anchor = session["counter_anchor"]
+    replay = Replay(build_screens(words, index_screens(words), my_screen), words, surface)
+    return replay.run(journal_events(replay, records)), session["c_round"]
+
+
+def synthetic_events(replay, rnd):
+    """
+    Events of a synthetic participant: a random line over every screen, with some zooming and deleting.
+
+    Args:
+        replay (Replay): the replay the events are for (the next events depend on where the mouse is).
+        rnd (random.Random): source of the random decisions.
+    """
+    now = SessionClock.now()
+    while not replay.finished:
+        screen = replay.current
+        if rnd.random() < 0.05:
+            yield "key", rnd.choice(("in", "out"))
+        x, y = screen.get_mouse()
+        x, y = int(x), int(y)
+        while x < screen.drawbox_width:
+            x = min(screen.drawbox_width, x + rnd.choice((1, 1, 2, 5, 17)))
+            y = max(0, min(screen.drawbox_height, y + rnd.randint(-8, 8)))
+            now += STEP_NS
+            yield "move", (x + screen.drawbox_x, y + screen.drawbox_y), now
+        if rnd.random() < 0.02:
+            yield "key", "delete"
+            continue
+        now += 50 * STEP_NS
+        yield "key", "forward"
+
+
+def replay_synthetic(csv_name, participants, resultfile, seed=0, render=False):
+    """
+    Runs synthetic participants one after the other and appends their results to a result file.
+
+    Args:
+        csv_name (str): the text, a csv file with a column "text".
+        participants (range or list of int): numbers of the participants, the random seed of each is seed + number.
+        resultfile (str): path of the csv file the results are appended to.
+        seed (int, optional): seed of the first participant. Defaults to 0.
+        render (bool, optional): draw every frame on the dummy display. Defaults to False.
+
+    Returns:
+        int, int: number of sessions and number of events.
+    """
+    my_screen = make_screen()
+    surface = pygame.display.set_mode((SCR_WIDTH, SCR_HEIGHT)) if render else None
+    font_name = default_font()
+    sessions = events = 0
+    for participant in participants:
+        SessionClock.start()
+        screens, words = load_text(csv_name, my_screen, font_name, TEXT_COLORS)
+        replay = Replay(screens, words, surface)
+        replay.run(synthetic_events(replay, random.Random(seed + participant)))
+        replay.properties({"Teilnahme-ID": f"synthetic_{participant}"})
+        save_and_compress(words, 1, resultfile)
+        sessions += 1
+        events += replay.events
+    return sessions, events
+
+
+def main():
+    parser = argparse.ArgumentParser(description="run sessions without a display")
+    parser.add_argument("--render", action="store_true", help="draw every frame on the dummy display")
+    parser.add_argument("--profile", help="csv file for a report of the stage times (see profiler.py)")
+    sources = parser.add_subparsers(dest="source", required=True)
+    recorded = sources.add_parser("journal", help="replay a recorded session")
+    recorded.add_argument("journal")
+    recorded.add_argument("resultfile")
+    synthetic = sources.add_parser("synthetic", help="run synthetic participants")
+    synthetic.add_argument("participants", type=int)
+    synthetic.add_argument("resultfile")
+    synthetic.add_argument("--text", default="dummy_text.csv", help="csv with the text (default: dummy_text.csv)")
+    synthetic.add_argument("--seed", type=int, default=0)
+    synthetic.add_argument("--workers", type=int, default=1,
+                           help="worker processes, each appends to its own result file (default: 1)")
+    args = parser.parse_args()
+
+    if args.profile:
+        Profiler.start()
+    start = time.perf_counter()
+    if args.source == "journal":
+        surface = pygame.display.set_mode((SCR_WIDTH, SCR_HEIGHT)) if args.render else None
+        replay, c_round = replay_journal(args.journal, surface)
+        save_and_compress(replay.words, c_round, args.resultfile)
+        sessions, events = 1, replay.events
+    elif args.workers <= 1:
+        sessions, events = replay_synthetic(args.text, range(args.participants), args.resultfile, args.seed,
+                                            args.render)
+    else:
+        stem, extension = os.path.splitext(args.resultfile)
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            parts = [pool.submit(replay_synthetic, args.text, range(k, args.participants, args.workers),
+                                 f"{stem}_{k}{extension}", args.seed, args.render) for k in range(args.workers)]
+            sessions = sum(part.result()[0] for part in parts)
+            events = sum(part.result()[1] for part in parts)
+    seconds = time.perf_counter() - start
+    print(f"{sessions} sessions, {events} events in {seconds:.2f} s ({events / seconds:.0f} events/s)")
+    if args.profile:
+        Profiler.write_report(args.profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,454 @@
+import os
 import pygame
 import time
+from types import MappingProxyType
 
 from auxiliaries import *
-from question_window import *
+from font_cache import FontMetrics
+from layout_cache import load_snapshot, save_snapshot, snapshot_key
+from columnar import partition_name, write_partition
+from profiler import Profiler
 import numpy as np
 
 
+class SessionClock:
+    """
+    time stamps for the recordings
+
+    samples are stamped with a monotonic nanosecond counter that never jumps (unlike the wall clock).
+    the wall clock is read once per session, so stamps can be turned into unix time stamps for the export.
+    """
+    wall_anchor = time.time()  # unix time at the anchor
+    counter_anchor = time.perf_counter_ns()  # counter at the anchor
+
+    @classmethod
+    def start(cls):
+        # anchor the clock at the start of a session
+        cls.wall_anchor = time.time()
+        cls.counter_anchor = time.perf_counter_ns()
+
+    @staticmethod
+    def now():
+        return time.perf_counter_ns()
+
+    @classmethod
+    def to_wall(cls, stamps):
+        # nanosecond stamps (a number or an array) -> unix time stamps in seconds
+        return cls.wall_anchor + (stamps - cls.counter_anchor) / 1e9
+
+
+class SampleStore:
+    """
+    The drawn values and times of all words of a text.
+
+    Samples are added in blocks (the points of a screen when it is committed) and read as one ragged array: the
+    samples of word i are values[offsets[i]:offsets[i + 1]], in the order in which they were added.
+
+    Attributes:
+        n_words (int): number of words.
+        blocks (list of tuple): (word indices, values, times) added since the samples were last packed.
+        offsets (numpy.ndarray): start of the packed samples of every word, and the end of the last word (words that
+            were added to the text later get their offsets in fill_offsets).
+        values (numpy.ndarray): the packed values.
+        times (numpy.ndarray): the packed times.
+        changes (int): counts the changes of the samples, so results calculated from them can tell if they are outdated.
+    """
+
+    def __init__(self, n_words):
+        self.n_words = n_words
+        self.changes = 0
+        self.blocks = []
+        self.offsets = np.zeros(n_words + 1, dtype=np.int64)
+        self.values = np.empty(0)
+        self.times = np.empty(0)
+
+    def grow(self, n_words):
+        # words were added to the text
+        self.n_words = n_words
+
+    def fill_offsets(self):
+        # the offsets of the words added since the last call: they have no samples yet
+        if len(self.offsets) <= self.n_words:
+            self.offsets = np.concatenate((self.offsets, np.full(self.n_words + 1 - len(self.offsets),
+                                                                 self.offsets[-1])))
+        return self.offsets
+
+    def extend(self, word_indices, values, times):
+        if len(values):
+            self.blocks.append((np.asarray(word_indices, dtype=np.int32), np.asarray(values, dtype=float),
+                                np.asarray(times, dtype=float)))
+            self.changes += 1
+
+    def pack(self):
+        """
+        Merges the added blocks into the ragged array.
+
+        Returns:
+            numpy.ndarray, numpy.ndarray, numpy.ndarray: offsets, values and times.
+        """
+        self.fill_offsets()
+        if self.blocks:
+            words = np.concatenate([np.repeat(np.arange(self.n_words), np.diff(self.offsets))] +
+                                   [block[0] for block in self.blocks])
+            order = np.argsort(words, kind="stable")  # keeps the samples of a word in the order they were added
+            self.values = np.concatenate([self.values] + [block[1] for block in self.blocks])[order]
+            self.times = np.concatenate([self.times] + [block[2] for block in self.blocks])[order]
+            self.offsets = np.concatenate(([0], np.cumsum(np.bincount(words, minlength=self.n_words))))
+            self.blocks = []
+        return self.offsets, self.values, self.times
+
+    def counts(self):
+        # number of samples of every word
+        return np.diff(self.pack()[0])
+
+    def of(self, index):
+        # values and times of one word
+        offsets, values, times = self.pack()
+        return values[offsets[index]:offsets[index + 1]], times[offsets[index]:offsets[index + 1]]
+
+    def delete(self, start, stop):
+        # removes the samples of the words start, ..., stop - 1
+        self.fill_offsets()
+        if self.offsets[start] == self.offsets[stop] and \
+                not any(((block[0] >= start) & (block[0] < stop)).any() for block in self.blocks):
+            return  # nothing to delete (the usual case: the words of a screen that is not committed yet)
+        offsets, values, times = self.pack()
+        self.changes += 1
+        a, b = offsets[start], offsets[stop]
+        self.values = np.concatenate((values[:a], values[b:]))
+        self.times = np.concatenate((times[:a], times[b:]))
+        self.offsets = offsets.copy()
+        self.offsets[start + 1:stop + 1] = a
+        self.offsets[stop + 1:] -= b - a
+
+
+class WordTable:
+    """
+    The words of a text, stored as columns with one entry per word in reading order.
+
+    Indexing gives Unit objects, which are views on one word of the table. Layout, measures and export work on the
+    columns. Words can be added at the end while a text is read (see TextLoader): the columns are views on arrays
+    that grow by doubling.
+
+    Attributes:
+        vocabulary (list of str): the distinct words of the text.
+        codes (dict): word -> its position in the vocabulary.
+        text_codes (numpy.ndarray): position of every word in the vocabulary.
+        columns (dict): column name -> numpy.ndarray, the columns of COLUMNS.
+        paragraph_properties (list of dict): the properties of every paragraph (line of the input csv), shared by
+            the words of the paragraph.
+        session_properties (dict): the properties of the whole session (participant metadata, questionnaire
+            answers). Paragraph and session properties are stored once and joined into the results when they are
+            written.
+        samples (SampleStore): the drawn values and times of the words.
+        measures (dict): measure name -> numpy.ndarray (one entry per word) or one value for all words, as
+            calculated by calculate_additional_properties.
+        metrics (tuple): (key, columns) of the last call of calculate_additional_properties, None before.
+        images (dict): word index -> the rendered word in color_1 and color_2, for the words of the screens in use.
+        shown_checked (numpy.ndarray): the checked state every word was last drawn with (-1: not drawn).
+        storage (dict): the arrays behind text_codes, shown_checked and the columns, with room for more words.
+    """
+    COLUMNS = {"number": np.int32, "width": np.int32, "height": np.int32, "position_x": np.int32,
+               "position_y": np.float64, "cumulative_x": np.int32, "cumulative_end": np.int32,
+               "cumulative_total": np.int32, "screen_width": np.int32, "screen_number": np.int32,
+               "paragraph": np.int32, "line_number_on_screen": np.int32, "checked": bool, "mean_value": np.float64}
+    # the columns that only depend on the text, the font and the geometry (see layout_cache.py)
+    LAYOUT = ("number", "width", "height", "position_x", "position_y", "cumulative_x", "cumulative_end",
+              "cumulative_total", "screen_width", "screen_number", "paragraph", "line_number_on_screen")
+
+    def __init__(self, texts=(), paragraphs=(), paragraph_properties=(), numbers=None):
+        """
+        Args:
+            texts (list of str, optional): the words.
+            paragraphs (list of int, optional): the paragraph of every word, counted from 1.
+            paragraph_properties (list of dict, optional): the properties of every paragraph.
+            numbers (list of int, optional): the numbers of the words. Defaults to 1, 2, 3, ...
+        """
+        self.vocabulary = []
+        self.codes = {}
+        self.paragraph_properties = []
+        self.session_properties = {}
+        self.samples = SampleStore(0)
+        self.measures = {}
+        self.metrics = None
+        self.images = {}
+        self.storage = {name: np.zeros(0, dtype=dtype) for name, dtype in self.COLUMNS.items()}
+        self.storage["text_codes"] = np.zeros(0, dtype=np.int32)
+        self.storage["shown_checked"] = np.zeros(0, dtype=np.int8)
+        self.size = 0
+        self.set_views()
+        self.append(texts, paragraphs, paragraph_properties, numbers)
+
+    def set_views(self):
+        # the columns are the first self.size entries of the storage
+        self.columns = {name: self.storage[name][:self.size] for name in self.COLUMNS}
+        self.text_codes = self.storage["text_codes"][:self.size]
+        self.shown_checked = self.storage["shown_checked"][:self.size]
+
+    def append(self, texts, paragraphs, paragraph_properties=(), numbers=None):
+        """
+        Adds words at the end of the text, with the other columns set to 0.
+
+        Args:
+            texts (list of str): the words.
+            paragraphs (list of int): the paragraph of every word, counted from 1.
+            paragraph_properties (list of dict, optional): the properties of the paragraphs that start here.
+            numbers (list of int, optional): the numbers of the words. Defaults to counting on from the last word.
+        """
+        start = self.size
+        stop = start + len(texts)
+        capacity = len(self.storage["text_codes"])
+        if stop > capacity:
+            capacity = stop if start == 0 else max(stop, 2 * capacity)  # a text that is read at once takes no more
+            for name, array in self.storage.items():
+                grown = np.full(capacity, -1 if name == "shown_checked" else 0, dtype=array.dtype)
+                grown[:start] = array[:start]
+                self.storage[name] = grown
+        codes = self.codes
+        vocabulary = self.vocabulary
+        text_codes = []
+        for text in texts:
+            code = codes.get(text)
+            if code is None:
+                code = codes[text] = len(vocabulary)
+                vocabulary.append(text)
+            text_codes.append(code)
+        self.storage["text_codes"][start:stop] = text_codes
+        self.storage["number"][start:stop] = np.arange(start + 1, stop + 1) if numbers is None else numbers
+        self.storage["paragraph"][start:stop] = paragraphs
+        self.paragraph_properties.extend(paragraph_properties)
+        self.size = stop
+        self.samples.grow(stop)
+        self.set_views()
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [Unit(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("word index out of range")
+        return Unit(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield Unit(self, index)
+
+    def texts(self, indices=None):
+        # the words as strings
+        codes = self.text_codes if indices is None else self.text_codes[indices]
+        return [self.vocabulary[c] for c in codes.tolist()]
+
+    def check(self, start, stop, mouse):
+        # Unit.check for the words start, ..., stop - 1 at once
+        if not 0 < mouse[0]:
+            return
+        c = self.columns
+        max_x = c["screen_width"][start:stop] * (c["cumulative_end"][start:stop] / c["cumulative_total"][start:stop])
+        c["checked"][start:stop] |= mouse[0] >= max_x - 5
+
+    def uncheck(self, start, stop):
+        # Unit.uncheck for the words start, ..., stop - 1 at once
+        self.columns["checked"][start:stop] = False
+        self.samples.delete(start, stop)
+
+    def properties(self):
+        """
+        The properties of every paragraph joined with the session properties (a session property replaces a
+        paragraph property of the same name).
+
+        Returns:
+            list of dict: one dict per paragraph, the further columns of the results.
+        """
+        return [{**properties, **self.session_properties} for properties in self.paragraph_properties]
+
+    def field(self, name, indices):
+        """
+        The values of a column or measure for some words, as python values (for the export).
+
+        Args:
+            name (str): name of a column or a measure, or "text".
+            indices (numpy.ndarray): the words.
+
+        Returns:
+            list: one value per word.
+        """
+        if name == "text":
+            return self.texts(indices)
+        if name in self.columns:
+            return self.columns[name][indices].tolist()
+        measure = self.measures[name]
+        if not isinstance(measure, np.ndarray):
+            return [measure] * len(indices)
+        values = measure[indices].tolist()
+        if name == "time_until_next_screen":  # the last screen has no next screen, 99999 is written as an integer
+            values = [99999 if v == 99999 else v for v in values]
+        return values
+
+    def to_columns(self):
+        # everything but the samples, as lists (see from_columns)
+        columns = {name: column.tolist() for name, column in self.columns.items()}
+        columns["text"] = self.texts()
+        columns["paragraph_properties"] = self.paragraph_properties
+        columns["session_properties"] = self.session_properties
+        return columns
+
+    @classmethod
+    def from_columns(cls, columns):
+        """
+        A word table from the columns of to_columns.
+        """
+        table = cls(columns["text"], columns["paragraph"], columns["paragraph_properties"], columns["number"])
+        for name in cls.COLUMNS:
+            if name in columns:
+                table.columns[name][:] = columns[name]
+        table.session_properties.update(columns.get("session_properties", {}))
+        return table
+
+    def layout_arrays(self):
+        # the layout columns and the text codes, as stored in a layout snapshot (see from_layout)
+        arrays = {name: self.columns[name] for name in self.LAYOUT}
+        arrays["text_codes"] = self.text_codes
+        return arrays
+
+    @classmethod
+    def from_layout(cls, arrays, vocabulary, paragraph_properties):
+        """
+        A word table on the arrays of layout_arrays, e.g. memory-mapped from a layout snapshot. The arrays are used
+        as they are, the columns that are not part of the layout start empty.
+
+        Args:
+            arrays (dict): name -> numpy.ndarray, the columns of LAYOUT and "text_codes".
+            vocabulary (list of str): the distinct words of the text.
+            paragraph_properties (list of dict): the properties of every paragraph.
+        """
+        table = cls()
+        size = len(arrays["text_codes"])
+        for name, array in table.storage.items():
+            table.storage[name] = arrays[name] if name in arrays else \
+                np.full(size, -1 if name == "shown_checked" else 0, dtype=array.dtype)
+        table.vocabulary = list(vocabulary)
+        table.codes = {text: code for code, text in enumerate(table.vocabulary)}
+        table.paragraph_properties = list(paragraph_properties)
+        table.size = size
+        table.samples.grow(size)
+        table.set_views()
+        return table
+
+
+class Column:
+    # an attribute of Unit that is kept in a column of its WordTable
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, unit, owner=None):
+        if unit is None:
+            return self
+        return unit.table.columns[self.name][unit.index].item()
+
+    def __set__(self, unit, value):
+        unit.table.columns[self.name][unit.index] = value
+
+
 class Unit:
     """
-        a word unit in the application
+        a word unit in the application: a view on one word of a WordTable
     """
+    __slots__ = ("table", "index")
     # class properties shared by all instances:
     font = None
+    metrics = None  # FontMetrics of the chosen font, word sizes are measured once and cached on disk
     color_1 = (0, 0, 0)
     color_2 = (0, 0, 0)
     number_of_lines = 0
 
-    def __init__(self, text, number, properties):
+    number = Column("number")  # Unique identifier for the word (word index)
+    width = Column("width")  # the size of the word in the textbox
+    height = Column("height")  # the size of the word in the textbox
+    position_x = Column("position_x")  # the position - of the word in the textbox
+    position_y = Column("position_y")  # the position - of the word in the textbox
+    cumulative_x = Column("cumulative_x")  # the position of the word in the textbox, if there were no line breaks
+    cumulative_end = Column("cumulative_end")  # the end position of the word in the textbox if there were no line breaks
+    cumulative_total = Column("cumulative_total")  # the end of the line if there were no line_breaks
+    screen_width = Column("screen_width")
+    screen_number = Column("screen_number")  # the number of the screen on which the word is shown
+    paragraph = Column("paragraph")  # the paragraph
+    line_number_on_screen = Column("line_number_on_screen")  # the number of the line on the screen of the word
+    checked = Column("checked")  # set to true if suspense value for word is drawn
+    mean_value = Column("mean_value")
+
+    def __init__(self, table, index):
         """
         Initializes a Unit object.
+
+        Args:
+            table (WordTable): the words of the text.
+            index (int): position of the word in the table.
         """
-        self.text = text
-        self.number = number  # Unique identifier for the word (word index)
-        self.properties = properties  # a dictionary of further properties
-        self.width = 0  # the size of the word in the textbox
-        self.height = 0  # the size of the word in the textbox
-        self.position_x = 0  # the position - of the word in the textbox
-        self.position_y = 0  # the position - of the word in the textbox
-        self.cumulative_x = 0  # the position of the word in the textbox, if there were no line breaks
-        self.cumulative_end = 0  # the end position of the word in the textbox if there were no line breaks
-        self.cumulative_total = 0  # the end of the line if there were no line_breaks
-        self.screen_width = 0
-        self.screen_number = 0  # the number of the screen on which the word is shown
-        self.paragraph = 0  # the paragraph
-        self.line_number_on_screen = 0  # the number of the line on the screen on which the word is shown
-        self.values = []  # these are the values that will be saved for all words
-        self.times = []  # these are the times saved for each word
-        self.checked = False  # set to true if suspense value for word is drawn
-        self.mean_value = 0
-
-    def set_font(self, my_font_name, text_height, number_of_lines):
+        self.table = table
+        self.index = index
+
+    @property
+    def text(self):
+        return self.table.vocabulary[self.table.text_codes[self.index]]
+
+    @property
+    def properties(self):
+        # the further properties of the word: those of its paragraph and of the session (read only, they are
+        # changed in the paragraph_properties and session_properties of the table)
+        return MappingProxyType({**self.table.paragraph_properties[self.table.columns["paragraph"][self.index] - 1],
+                                 **self.table.session_properties})
+
+    @property
+    def values(self):
+        # the values drawn for this word
+        return self.table.samples.of(self.index)[0].tolist()
+
+    @property
+    def times(self):
+        # the times at which the values were drawn
+        return self.table.samples.of(self.index)[1].tolist()
+
+    @property
+    def images(self):
+        # the rendered word in color_1 and color_2, rendered once when first shown
+        return self.table.images.get(self.index)
+
+    @images.setter
+    def images(self, images):
+        if images is None:
+            self.table.images.pop(self.index, None)
+        else:
+            self.table.images[self.index] = images
+
+    @property
+    def shown_checked(self):
+        # the checked state the word was last drawn with on its screen's text layer
+        shown = self.table.shown_checked[self.index]
+        return None if shown < 0 else bool(shown)
+
+    @shown_checked.setter
+    def shown_checked(self, shown):
+        self.table.shown_checked[self.index] = -1 if shown is None else shown
+
+    def __getattr__(self, name):
+        # the measures of calculate_additional_properties
+        if name in Unit.__slots__:  # not set yet (e.g. while a copy is made)
+            raise AttributeError(name)
+        measures = self.table.measures
+        if name not in measures:
+            raise AttributeError(name)
+        measure = measures[name]
+        return measure[self.index].item() if isinstance(measure, np.ndarray) else measure
+
+    @classmethod
+    def set_font(cls, my_font_name, text_height, number_of_lines):
         """
         try to render a word in pygame
-        Find font size according to number of lines per screen
+        Find font size according to number of lines per screen (for all words, also before there are any)
 
         Args:
         my_font_name (str): Name of the font.
@@ -52,20 +458,34 @@ class Unit:
         left, right = 1, 50  # Set appropriate font size range
         while left <= right:
             mid = (left + right) // 2
-            chosen_font = pygame.font.SysFont(my_font_name, mid)
-            img = chosen_font.render("Text I I II", True, self.color_1)
-            rect = img.get_rect()
-            h = rect.height
+            h = FontMetrics.get(my_font_name, mid).measure("Text I I II")[1]
             if h > text_height / number_of_lines:
                 right = mid - 1
             else:
                 left = mid + 1
-        Unit.font = pygame.font.SysFont(my_font_name, left - 1)
-        Unit.number_of_lines = number_of_lines
+        for metrics in FontMetrics.loaded.values():
+            metrics.save()
+        cls.use_font(my_font_name, left - 1, number_of_lines)
+
+    @classmethod
+    def use_font(cls, my_font_name, size, number_of_lines):
+        """
+        Sets the font for all words, with a size that is already known (see set_font).
+
+        Args:
+        my_font_name (str): Name of the font.
+        size (int): font size.
+        number_of_lines (int): Number of lines per screen.
+        """
+        cls.metrics = FontMetrics.get(my_font_name, size)
+        cls.font = pygame.font.SysFont(my_font_name, size)
+        cls.metrics.font = cls.font
+        cls.number_of_lines = number_of_lines
 
-    def set_color(self, color1, color2):
-        Unit.color_1 = color1
-        Unit.color_2 = color2
+    @classmethod
+    def set_color(cls, color1, color2):
+        cls.color_1 = color1
+        cls.color_2 = color2
 
     def __repr__(self):
         s = f"(w: {self.text}| " \
@@ -81,14 +501,24 @@ class Unit:
             f"c: {self.cumulative_x}{self.cumulative_end}/{self.cumulative_total})"
         return s
 
-    def show(self, surface):
+    def show(self, surface, background=None):
         """show word on the screen in correct color:
-        when the measure is drawn for the word, the color of the displayed word is different"""
-        if self.checked:
-            r = self.font.render(self.text, True, self.color_2)
-        else:
-            r = self.font.render(self.text, True, self.color_1)
-        surface.blit(r, (self.position_x, self.position_y))
+        when the measure is drawn for the word, the color of the displayed word is different
+
+        both colored versions of the word are rendered only once and reused afterwards
+        if a background color is given, the area of the word is cleared first (needed when the color changes)
+        returns the rect that was drawn on
+        """
+        if self.images is None:
+            self.images = (self.font.render(self.text, True, self.color_1),
+                           self.font.render(self.text, True, self.color_2))
+        image = self.images[1] if self.checked else self.images[0]
+        rect = image.get_rect(topleft=(self.position_x, self.position_y))
+        if background is not None:
+            surface.fill(background, rect)
+        surface.blit(image, rect)
+        self.shown_checked = self.checked
+        return rect
 
     def check(self, mouse):
         """This function checks for a word if there is already a suspense line for it.
@@ -110,33 +540,11 @@ class Unit:
         self.checked = False
         self.delete_values()
 
-    def store_values(self, values, times, screen):
-        """
-
-        :param values: values drawn for this word
-        :param times: time stamps of drawn values
-        :param screen: at which screen this word was shown
-        :return:
-        """
-        min_x = self.screen_width * self.cumulative_x / self.cumulative_total
-        max_x = self.screen_width * self.cumulative_end / self.cumulative_total
-        all_values = []
-        for i in range(len(values)):  # values are tuples of (x,y)
-            if min_x <= values[i][0] <= max_x:  # if x_coordinate within word start and end positions
-                all_values.append(values[i][1])
-                self.values.append(values[i][1])  # store heights
-                self.times.append(times[i])  # store times at which points were drawn
-        m = np.mean(all_values)
-        if m > 0:
-            if not screen.memorybox.training:
-                screen.memorybox.update_values(int(m))
-
     def delete_values(self):
-        self.values = []
-        self.times = []
+        self.table.samples.delete(self.index, self.index + 1)
 
     def __eq__(self, other):
-        return self == other
+        return isinstance(other, Unit) and self.table is other.table and self.index == other.index
 
     def __str__(self):
         return self.__repr__()
@@ -159,6 +567,8 @@ class Screen:
     memorybox_width = 0
     memorybox_y = 0
     memorybox_x = 0
+    dirty_updates = True  # only update the changed parts of the display while drawing
+    on_display = None  # the screen that was drawn on the display last
 
     def set_geometric_indices(self, SCR_HEIGHT, TXT_HEIGHT, SCR_WIDTH, TXT_WIDTH, TXT_Y, TXT_X, SUSPENSE_HEIGHT,
                               SUSPENSE_SPACE, MEMORY):
@@ -171,7 +581,6 @@ class Screen:
         Screen.drawbox_width = self.textbox_width
         Screen.drawbox_y = int(self.textbox_y - (SCR_HEIGHT * SUSPENSE_SPACE / 100) - self.drawbox_height)
         Screen.drawbox_x = self.textbox_x
-        Unit.screen_width = Screen.textbox_width
         Screen.memorybox_height = int(SCR_HEIGHT * MEMORY / 100)
         Screen.memorybox_width = self.textbox_width
         Screen.memorybox_y = int(self.textbox_y + self.textbox_height + 5)
@@ -209,18 +618,38 @@ class Screen:
         if textbackground is not None:
             Screen.text_background = textbackground
         self.allowed_keys = []  # between training vs. main phase different keys are allowed
-        self.next_screen = None
-        self.previous_screen = None
+        self.screens = None  # the Screens this screen belongs to, the neighbouring screens are looked up there
         self.checked = False
         self.shown = False
         self.last_mouse_position_absolute = (self.drawbox_x, self.drawbox_y + self.drawbox_height)  # lower left corner
         self.last_mouse_position_relative = (0, self.drawbox_height)  # set to lower left corner
         self.last_mouse_position_value = 0  # "suspense value"
         self.allow_mouse = True  # is moving the mouse allowed? (in some training screens, it may not)
+        self.word_range = None  # (start, stop) of the words of this screen in the whole text
+        self.table = None  # the WordTable of the whole text, self.words are its words in word_range
+        self.text_layer = None  # the rendered text of this screen, kept while the screen is in use
+        self.redraw = True  # the next show has to draw the whole screen (after zooming, deleting, ...)
+        self.journal = None  # the Journal the drawing on this screen is recorded in (None: not recorded)
 
     def __eq__(self, other):
         return str(self) == str(other)
 
+    @property
+    def next_screen(self):
+        # the following screen (built if needed), None for the last screen
+        return self.screens.get(self.number + 1) if self.screens is not None else None
+
+    @property
+    def previous_screen(self):
+        # the preceding screen (built if needed), None for the first screen
+        return self.screens.get(self.number - 1) if self.screens is not None else None
+
+    def hand_over(self, screen):
+        # the screen that is shown next: the screens far away from it are taken down
+        if self.screens is not None:
+            self.screens.move_to(screen.number)
+        return screen
+
     def __str__(self):
         return self.__repr__()
 
@@ -235,21 +664,71 @@ class Screen:
         self.last_mouse_position_relative = new_mouse
         self.last_mouse_position_absolute = (new_mouse[0] + self.drawbox_x, new_mouse[1] + self.drawbox_y)
 
+    def mouse_input(self, position, buttons, now=None):
+        """
+        Feeds one mouse position into the drawing box.
+
+        Args:
+            position (tuple): absolute mouse position on the display.
+            buttons (tuple): state of the mouse buttons at that position (left, middle, right).
+            now (int, optional): SessionClock time of the position (for replays), defaults to the current time.
+
+        Returns:
+            bool: False if the mouse has to be put back to the end of the line, True otherwise.
+        """
+        if tuple(buttons[:3]) != (1, 0, 0):  # only drawing with the left button is allowed
+            return position == tuple(int(c) for c in self.set_mouse())  # set_pos cuts off decimals
+        mouse_x, mouse_y = position
+        # first check if the mouse is in the box
+        if self.drawbox_x <= mouse_x <= self.drawbox_width + self.drawbox_x and \
+                self.drawbox_y <= mouse_y <= self.drawbox_height + self.drawbox_y:
+            mouse_x = mouse_x - self.drawbox_x
+            mouse_y = mouse_y - self.drawbox_y
+            if (mouse_x, mouse_y) == self.last_mouse_position_relative:  # the mouse did not move
+                return True
+            if mouse_x >= self.get_mouse()[0]:
+                if self.allow_mouse:
+                    if now is None:
+                        now = SessionClock.now()
+                    if Profiler.enabled:
+                        start = time.perf_counter_ns()
+                    self.drawbox.record_mouse(self.get_mouse(), (mouse_x, mouse_y), now)
+                    if Profiler.enabled:
+                        Profiler.lap("record_mouse", start)
+                    if self.journal is not None:
+                        self.journal.stroke(self.number, self.get_mouse(), (mouse_x, mouse_y),
+                                            DrawBox.current_max_y, now)
+                    self.change_last_mouse((mouse_x, mouse_y))
+                    self.shown = False
+            else:  # drawing backwards is not possible
+                return False
+        return True
+
     def set_allowed_key(self, key):
         self.allowed_keys.append(key)
 
     def get_checked(self):
         if self.checked:  # for screens which are checked by default
             return True
-        else:
-            for word in self.words:  # only checked screens allow to move forward!
-                if not word.checked:
-                    return False
-        return True
+        start, stop = self.word_range
+        return bool(self.table.columns["checked"][start:stop].all())  # only checked screens allow to move forward!
+
+    def store_values(self):
+        """
+        Stores the drawn values and times of this screen with its words.
+
+        Every word gets the points whose x lies within the part of the drawing box that belongs to it
+        (start and end of the word in relation to the whole screen, as if all lines were one line).
+        The means of the words are added to the memory box.
+        """
+        means = assign_samples(self.table, *self.word_range, self.drawbox.values, self.drawbox.times)
+        if self.journal is not None:
+            self.journal.commit(self.number, self.drawbox.values, self.drawbox.times)
+        if not self.memorybox.training:
+            self.memorybox.extend_values(means[means > 0].astype(int).tolist())
 
     def check_words(self):
-        for w in self.words:
-            w.check(self.last_mouse_position_relative)
+        self.table.check(*self.word_range, self.last_mouse_position_relative)
 
     def set_value_mouse(self):
         """
@@ -276,19 +755,24 @@ class Screen:
                     self.next_screen.get_mouse_from_value()
                 if self.allow_mouse:  # if drawing was possible, store all values for this screen
                     if self.get_checked():
+                        if Profiler.enabled:
+                            start = time.perf_counter_ns()
                         self.drawbox.map_from_pixel()
-                        for w in self.words:
-                            w.store_values(self.drawbox.values, self.drawbox.times, self)
+                        self.store_values()
+                        if Profiler.enabled:
+                            Profiler.lap("screen commit", start)
                         MemoryBox.tobeshown = True
                         self.next_screen.last_mouse_position_relative = 0, self.last_mouse_position_relative[1]
                         self.next_screen.last_mouse_position_absolute = self.drawbox_x, self.last_mouse_position_absolute[1]
-                        return self.next_screen
+                        self.release_surfaces()
+                        return self.hand_over(self.next_screen)
                     else:
                         return "play_error"  # drawing not done but participants want to move forward: play error sound
                 else:
                     self.shown = False
                     self.next_screen.shown = False
-                    return self.next_screen
+                    self.release_surfaces()
+                    return self.hand_over(self.next_screen)
             else:
                 return "no next screen found"
         elif action == "backward":  # if people move to previous screen
@@ -299,7 +783,8 @@ class Screen:
                 self.shown = False
                 self.previous_screen.shown = False
                 self.previous_screen.allow_mouse = False
-                return self.previous_screen
+                self.release_surfaces()
+                return self.hand_over(self.previous_screen)
             else:
                 return "play_error"
         elif action == "delete":
@@ -312,9 +797,11 @@ class Screen:
                     self.last_mouse_position_absolute = (self.drawbox_x, self.drawbox_y + self.drawbox_height)
                     self.last_mouse_position_relative = (0, self.drawbox_height)
                 self.drawbox.delete_values()
+                if self.journal is not None:
+                    self.journal.delete(self.number)
                 self.shown = False
-                for w in self.words:
-                    w.uncheck()
+                self.redraw = True
+                self.table.uncheck(*self.word_range)
                 return self
             else:
                 return "play_error"  # if no drawing is allowed, deleting results in error sound
@@ -327,6 +814,7 @@ class Screen:
                 self.drawbox.map_to_pixel()
                 self.get_mouse_from_value()
                 self.shown = False
+                self.redraw = True
             return self
         elif action == "out":  # zooming: halve the suspense max (if suspense gets smaller)
             if DrawBox.current_max_y > DrawBox.min_y:
@@ -335,21 +823,49 @@ class Screen:
                 self.drawbox.map_to_pixel()
                 self.get_mouse_from_value()
                 self.shown = False
+                self.redraw = True
             return self
         elif action == "getout":
             return "getout"
 
     def plot_words(self):
-        textsurface = pygame.Surface(size=(self.textbox_width, self.textbox_height))
-        textsurface.fill(self.text_background)
-        for w in self.words:
-            w.show(textsurface)
-        return textsurface
+        """
+        Keeps the text of this screen on its own surface between frames.
+        Only the words whose checked state changed since they were last drawn are drawn again.
+
+        Returns:
+            list of pygame.Rect: the areas of the text layer that changed (relative to the text box)
+        """
+        start, stop = self.word_range
+        shown_checked = self.table.shown_checked[start:stop]
+        if self.text_layer is None:
+            self.text_layer = pygame.Surface(size=(self.textbox_width, self.textbox_height))
+            self.text_layer.fill(self.text_background)
+            shown_checked[:] = -1
+        changed = []
+        for i in np.flatnonzero(shown_checked != self.table.columns["checked"][start:stop]).tolist():
+            changed.append(self.words[i].show(self.text_layer, self.text_background))
+        return changed
+
+    def release_surfaces(self):
+        """
+        Frees the text layer, the rendered words and the stroke layer when the screen is left,
+        they are rebuilt when it is shown again.
+        """
+        self.text_layer = None
+        for index in range(*self.word_range):
+            self.table.images.pop(index, None)
+        self.drawbox.layer = None
 
     def show(self, pysurface):
         """
         Displays the screen elements on the provided Pygame surface.
 
+        If dirty_updates is on and this screen is already on the display, only the parts that changed since the
+        last frame are drawn and updated: the strip of the drawing box with new points, the memory box when it
+        changed and the words that just got checked. Otherwise, the whole screen is drawn and the whole display is
+        updated.
+
         Args:
             pysurface (pygame.Surface): The Pygame surface on which the screen elements will be displayed.
 
@@ -357,18 +873,40 @@ class Screen:
             None
         """
         assert isinstance(pysurface, pygame.Surface)
+        profile = Profiler.enabled
+        if profile:
+            frame_start = t = time.perf_counter_ns()
+        full = not self.dirty_updates or self.redraw or Screen.on_display is not self
+        dirty_rects = []
 
         # Blit the drawing box on the surface at the specified position
-        pysurface.blit(self.drawbox.show(), (self.drawbox_x, self.drawbox_y))
+        drawbox_surface = self.drawbox.show()
+        span = self.drawbox.take_dirty()
+        if full:
+            pysurface.blit(drawbox_surface, (self.drawbox_x, self.drawbox_y))
+        elif span is not None:
+            # the points between the two x-values are new, circles reach 5 pixels further on both sides
+            area = pygame.Rect(span[0] - 6, 0, span[1] - span[0] + 13, self.drawbox_height)
+            area = area.clip(drawbox_surface.get_rect())
+            pysurface.blit(drawbox_surface, (self.drawbox_x + area.x, self.drawbox_y), area)
+            # the strip reaches down over the arrow on the lower edge of the box
+            dirty_rects.append(pygame.Rect(self.drawbox_x + area.x, self.drawbox_y, area.width,
+                                           self.drawbox_height + 2))
+        if profile:
+            t = Profiler.lap("drawbox show", t)
 
         # Check if the memory box should be displayed
         if self.memorybox.tobeshown:
             # Update the maximum y-coordinate value based on MemoryBox values
-            MemoryBox.current_max_y = max([x[1] for x in MemoryBox.values])
+            MemoryBox.current_max_y = MemoryBox.max_value
             # Blit the memory box on the surface at the specified position
             pysurface.blit(self.memorybox.show(), (self.memorybox_x, self.memorybox_y))
+            dirty_rects.append(pygame.Rect(self.memorybox_x, self.memorybox_y, self.memorybox_width,
+                                           self.memorybox_height))
             # Mark MemoryBox as shown and reset the flag
             MemoryBox.tobeshown = False
+            if profile:
+                t = Profiler.lap("memorybox show", t)
 
         # Draw arrows at the edges of the drawing box
         arrow(pysurface, self.draw_box_line, self.draw_box_line,
@@ -378,17 +916,36 @@ class Screen:
               (self.drawbox_x, self.drawbox_height + self.drawbox_y),
               (self.drawbox_x + self.drawbox_width, self.drawbox_height + self.drawbox_y), 10)
 
+        if profile:
+            t = Profiler.lap("arrows", t)
+
         # Check the words on the screen for user interactions
         self.check_words()
 
-        # Render and blit text elements on the surface at the specified position
-        pysurface.blit(self.plot_words(), (self.textbox_x, self.textbox_y))
+        # Draw the words that changed on the text layer and blit it on the surface at the specified position
+        changed_words = self.plot_words()
+        if full:
+            pysurface.blit(self.text_layer, (self.textbox_x, self.textbox_y))
+        else:
+            for rect in changed_words:
+                pysurface.blit(self.text_layer, (self.textbox_x + rect.x, self.textbox_y + rect.y), rect)
+                dirty_rects.append(rect.move(self.textbox_x, self.textbox_y))
+        if profile:
+            t = Profiler.lap("text", t)
 
         # Update the display to show the changes
-        pygame.display.update()
+        if full:
+            pygame.display.update()
+        elif dirty_rects:
+            pygame.display.update(dirty_rects)
+        if profile:
+            Profiler.lap("display update (full)" if full else "display update", t)
+            Profiler.lap("frame (full)" if full else "frame", frame_start)
 
         # Mark the screen as shown
         self.shown = True
+        self.redraw = False
+        Screen.on_display = self
 
     def __repr__(self):
         s = f"\n(screen:{self.number}| " \
@@ -401,8 +958,7 @@ class Screen:
 
     def restart_memorybox(self):
         # set all previous suspense values to -1:
-        for d in MemoryBox.values:
-            d[1] = -1
+        self.memorybox.clear_values()
         self.memorybox.tobeshown = True
 
 
@@ -411,8 +967,13 @@ class MemoryBox:
     display previously drawn bits of suspense arc
 
     Attributes:
-        values (list): A list to store suspense arc values as tuples (x, y).
-        drawn_values (list): A list to store drawn suspense arc values as tuples (x, y).
+        values (numpy.ndarray): suspense arc values as rows (x, y), one per word of the text.
+        drawn_values (numpy.ndarray): drawn suspense arc as rows (x, y of the biggest value, y of the smallest value),
+            one per x-pixel that has values.
+        write_cursor (int): index of the first value that has not been drawn yet.
+        max_value (float): the biggest value drawn so far.
+        column_min, column_max (numpy.ndarray): smallest and biggest value on each x-pixel of the box, so the box
+            can be drawn with one bar per x-pixel, no matter how many words the text has.
         current_max_y (float): The current maximum suspense value being displayed.
         training (bool): A flag indicating whether the memory box is used for training.
         background_color (tuple): RGB color tuple
@@ -422,8 +983,12 @@ class MemoryBox:
         tobeshown (bool): A flag indicating whether the memory box should be displayed.
     """
 
-    values = []
-    drawn_values = []
+    values = np.empty((0, 2))  # (x, value) for every word of the text, -1 until the word is drawn
+    drawn_values = np.empty((0, 2))
+    write_cursor = 0  # index of the first value that is still -1
+    max_value = -1  # the biggest value so far
+    column_min = np.empty(0)  # the smallest value on each x-pixel of the box (nan if there is none yet)
+    column_max = np.empty(0)  # the biggest value on each x-pixel of the box (nan if there is none yet)
     current_max_y = 0
     height = 0
     width = 0
@@ -464,32 +1029,57 @@ class MemoryBox:
 
         Args:
             n (float): The new suspense value to update the values with
-            (all values start with height 1: the first occurrence of -1 is replaced with the new value
+            (all values start with height -1: the first occurrence of -1 is replaced with the new value,
+            which is the one at the write cursor)
 
         Returns:
             None
         """
-        i = 0
-        done = False
-        while not done:
-            if self.values[i][1] == -1:
-                self.values[i][1] = n
-                done = True
-            i += 1
+        MemoryBox.values[MemoryBox.write_cursor, 1] = n
+        self.add_to_columns(MemoryBox.write_cursor, MemoryBox.write_cursor + 1)
+        MemoryBox.write_cursor += 1
+        MemoryBox.max_value = max(MemoryBox.max_value, n)
 
-    def map_from_pixel(self):
+    def extend_values(self, ns):
+        """
+        Updates suspense arc values with several new suspense values at once, in order.
+
+        Args:
+            ns (list): The new suspense values, they replace the first occurrences of -1
+
+        Returns:
+            None
+        """
+        if not ns:
+            return
+        MemoryBox.values[MemoryBox.write_cursor:MemoryBox.write_cursor + len(ns), 1] = ns
+        self.add_to_columns(MemoryBox.write_cursor, MemoryBox.write_cursor + len(ns))
+        MemoryBox.write_cursor += len(ns)
+        MemoryBox.max_value = max(MemoryBox.max_value, max(ns))
+
+    def add_to_columns(self, first, last):
+        """
+        Adds the values between two indices to the smallest and biggest value of their x-pixels.
+
+        Returns:
+            None
+        """
+        xs = MemoryBox.values[first:last, 0].astype(int)
+        np.fmin.at(MemoryBox.column_min, xs, MemoryBox.values[first:last, 1])
+        np.fmax.at(MemoryBox.column_max, xs, MemoryBox.values[first:last, 1])
+
+    def clear_values(self):
         """
-        Maps drawn pixel heights to absolute suspense heights and updates self.values.
+        Sets all suspense values back to -1.
 
         Returns:
             None
         """
-        self.values = []
-        for (x, y) in self.drawn_values:
-            new_x = x
-            y = self.height - y
-            new_y = y * self.current_max_y / self.height
-            self.values.append((new_x, new_y))
+        MemoryBox.values[:, 1] = -1
+        MemoryBox.write_cursor = 0
+        MemoryBox.max_value = -1
+        MemoryBox.column_min = np.full(self.width, np.nan)
+        MemoryBox.column_max = np.full(self.width, np.nan)
 
     def init_values(self, words):
         """
@@ -502,25 +1092,20 @@ class MemoryBox:
             None
         """
         n = len(words)
-        for i in range(len(words)):
-            self.values.append([(i * self.width) // n, -1])
+        MemoryBox.values = np.column_stack(((np.arange(n) * self.width) // n, np.full(n, -1.)))
+        self.clear_values()
 
     def map_to_pixel(self):
         """
-        Maps absolute suspense coordinates to pixel coordinates and updates self.drawn_values.
+        Maps the smallest and biggest value of every x-pixel to pixel coordinates and updates self.drawn_values.
 
         Returns:
             None
         """
-        self.drawn_values = []
-        for (x, y) in self.values:
-            new_x = x
-            if self.current_max_y != 0:
-                new_y = self.height - (y * self.height / self.current_max_y)
-            else:
-                new_y = self.height - (y * self.height / 1)
-            if new_x not in [x[0] for x in self.drawn_values]:
-                self.drawn_values.append((new_x, new_y))
+        max_y = self.current_max_y if self.current_max_y != 0 else 1
+        xs = np.flatnonzero(~np.isnan(MemoryBox.column_max))
+        MemoryBox.drawn_values = np.column_stack((xs, self.height - (MemoryBox.column_max[xs] * self.height / max_y),
+                                                  self.height - (MemoryBox.column_min[xs] * self.height / max_y)))
 
     def rezoom(self, x):
         """
@@ -546,18 +1131,22 @@ class MemoryBox:
         y_text_oben = self.font.render(str(self.current_max_y), True, self.text_color)
         y_text_unten = self.font.render(str(0), True, self.text_color)
         if not self.training:
-            if self.values:
-                self.map_to_pixel()
+            self.map_to_pixel()
             surface.blit(y_text_oben, (0, 0))
             surface.blit(y_text_unten, (0, self.height - y_text_unten.get_rect().height))
-            for coord in self.drawn_values:
-                pygame.draw.circle(surface, self.line_color, (coord[0], coord[1]), 5)
+            for x, top, bottom in self.drawn_values.tolist():  # one bar from the biggest to the smallest value per x
+                pygame.draw.circle(surface, self.line_color, (x, top), 5)
+                if bottom > top:
+                    pygame.draw.rect(surface, self.line_color, (x - 5, top, 11, bottom - top))
+                    pygame.draw.circle(surface, self.line_color, (x, bottom), 5)
 
         return surface
 
 
 class DrawBox:
     # suspense boxes are the canvasses on which suspense lines can be drawn.
+    # drawing only goes from left to right, so there is at most one point per x-pixel: the points are kept in
+    # arrays indexed by x (pixel heights, times and which x-pixels were drawn)
     max_y = 0
     min_y = 0
     current_max_y = 0
@@ -567,6 +1156,7 @@ class DrawBox:
     line_color = (0, 0, 0)
     text_color = (0, 0, 0)
     font = None
+    labels = {}  # current_max_y -> rendered margin numbers (upper, lower)
 
     def __init__(self, current_mx, mx, mn, height, width, background_color, text_color, line_color, font):
         DrawBox.max_y = mx  # the biggest max - the maximal max
@@ -574,10 +1164,15 @@ class DrawBox:
         DrawBox.current_max_y = current_mx  # the max that is being shown right now
         DrawBox.height = height  # the number of pixels in the graphical realization = height of the box!
         DrawBox.width = width  # the width of the drawbox
-        self.values = []  # pairs of (x,y) for each dot given in the suspense lines, coordinates will be saved
-        self.times = []  # time at which a value was drawn
+        self.values = np.empty((0, 2))  # pairs of (x,y) for each dot given in the suspense lines, coordinates will be saved
+        self.times = np.empty(0)  # time at which a value was drawn
         self.starting_time = 0
-        self.drawn_values = []
+        self.ys = None  # pixel height of the point at each x, allocated with the first point
+        self.ts = None  # time at which the point at each x was drawn (SessionClock nanoseconds)
+        self.drawn = None  # True for every x that has a point
+        self.pixel_max_y = current_mx  # the zoom (max) at which the pixel heights in self.ys were drawn
+        self.dirty = None  # (min x, max x) of the points recorded since the box was last shown
+        self.layer = None  # everything drawn so far, new points are painted onto it
         DrawBox.background_color = background_color
         DrawBox.line_color = line_color
         DrawBox.text_color = text_color
@@ -587,23 +1182,40 @@ class DrawBox:
         if self.starting_time == 0:  # starting time has not been set yet, this screen has never been seen
             self.starting_time = starting_time
 
+    def clear_buffer(self):
+        # one slot per x-pixel of the box, the mouse x can be anywhere from 0 to width
+        self.ys = np.zeros(self.width + 1)
+        self.ts = np.zeros(self.width + 1, dtype=np.int64)
+        self.drawn = np.zeros(self.width + 1, dtype=bool)
+        self.pixel_max_y = self.current_max_y
+
+    @property
+    def drawn_values(self):
+        # pixel coordinates (x,y) of all points, ordered by x
+        if self.ys is None:
+            return np.empty((0, 2))
+        xs = np.flatnonzero(self.drawn)
+        return np.column_stack((xs, self.ys[xs]))
+
     def map_from_pixel(self):
         # we convert values from drawn heights into absolute suspense heights, we save heights and times into the object
-        self.values = []
-        for (x, y) in self.drawn_values:
-            new_x = x
-            y = self.height - y
-            new_y = y * self.current_max_y / self.height
-            self.values.append((new_x, new_y))
+        # (all points at once, this is done when the screen is left, not while drawing)
+        if self.ys is None:
+            self.values = np.empty((0, 2))
+            self.times = np.empty(0)
+            return
+        xs = np.flatnonzero(self.drawn)
+        self.values = np.column_stack((xs, (self.height - self.ys[xs]) * self.pixel_max_y / self.height))
+        self.times = SessionClock.to_wall(self.ts[xs])
 
     def map_to_pixel(self):
-        # map each actual coordinate to a position on the screen
-        # these values are not saved into the suspense boxes
-        self.drawn_values = []
-        for (x, y) in self.values:
-            new_x = x
-            new_y = self.height - (y * self.height / self.current_max_y)
-            self.drawn_values.append((new_x, new_y))
+        # map each point to a position on the screen at the current zoom
+        # the pixel heights are only rescaled if the zoom changed since they were drawn
+        if self.pixel_max_y != self.current_max_y:
+            if self.ys is not None:
+                self.ys = self.height - (self.height - self.ys) * self.pixel_max_y / self.current_max_y
+            self.layer = None  # all points moved, the stroke layer has to be painted again
+        self.pixel_max_y = self.current_max_y
 
     def rezoom(self, x):
         self.current_max_y = x
@@ -613,66 +1225,527 @@ class DrawBox:
         return s
 
     def delete_values(self):
-        self.values = []
-        self.drawn_values = []
-        self.times = []
+        self.values = np.empty((0, 2))
+        self.times = np.empty(0)
+        self.ys = None
+        self.ts = None
+        self.drawn = None
+        self.layer = None
         print(f" values are deleted ")
 
-    def record_mouse(self, old, new):
+    def compact(self):
+        """
+        The points drawn so far, for a screen that is taken down: (x, pixel height, time) of every point or None,
+        and the zoom the pixel heights belong to.
+        """
+        if self.ys is None:
+            return None, self.pixel_max_y
+        xs = np.flatnonzero(self.drawn)
+        return (xs, self.ys[xs], self.ts[xs]), self.pixel_max_y
+
+    def restore(self, points, pixel_max_y):
+        # put points returned by compact back into the buffer
+        if points is None:
+            return
+        xs, ys, ts = points
+        self.clear_buffer()
+        self.ys[xs] = ys
+        self.ts[xs] = ts
+        self.drawn[xs] = True
+        self.pixel_max_y = pixel_max_y
+
+    def take_dirty(self):
+        """
+        Returns the x-range of the points recorded since the last call (None if nothing was recorded)
+        """
+        span = self.dirty
+        self.dirty = None
+        return span
+
+    def record_mouse(self, old, new, now=None):
+        # adds the points from the old to the new mouse position, now is the SessionClock time of the new position
         old_x, old_y = old
         new_x, new_y = new
-        if old not in self.drawn_values:
-            self.drawn_values.append(old)
-            self.times.append(time.time())
-        if old_x + 1 == new_x:
-            self.drawn_values.append(new)
-            self.times.append(time.time())
+        if self.dirty is None:
+            self.dirty = (min(old_x, new_x), max(old_x, new_x))
         else:
-            # if values are drawn too fast, all values between the caught mouse points are linearly interpolated
-            if new_x != old_x:
-                a = (new_y - old_y) / (new_x - old_x)
-                b = (new_x * old_y - new_y * old_x) / (new_x - old_x)
-                for x in range(old_x, new_x):
-                    self.drawn_values.append((x, a * x + b))
-                    self.times.append(time.time())
-        self.map_from_pixel()
+            self.dirty = (min(self.dirty[0], old_x, new_x), max(self.dirty[1], old_x, new_x))
+        if self.ys is None:
+            self.clear_buffer()
+        elif self.pixel_max_y != self.current_max_y:
+            self.map_to_pixel()
+        if now is None:
+            now = SessionClock.now()
+        if not self.drawn[old_x] or self.ys[old_x] != old_y:
+            self.ys[old_x] = old_y
+            self.ts[old_x] = now
+            self.drawn[old_x] = True
+        if new_x > old_x:
+            # if values are drawn too fast, all values between the caught mouse points are linearly interpolated,
+            # their times lie between the time of the old point and now
+            share = np.arange(1, new_x - old_x + 1) / (new_x - old_x)
+            self.ys[old_x + 1:new_x + 1] = old_y + (new_y - old_y) * share
+            self.ys[new_x] = new_y
+            self.ts[old_x + 1:new_x + 1] = self.ts[old_x] + np.round((now - self.ts[old_x]) * share)
+            self.drawn[old_x + 1:new_x + 1] = True
+
+    def get_labels(self):
+        # margin numbers displayed, rendered once per zoom
+        if self.current_max_y not in DrawBox.labels:
+            DrawBox.labels[self.current_max_y] = (self.font.render(str(self.current_max_y), True, self.text_color),
+                                                  self.font.render(str(0), True, self.text_color))
+        return DrawBox.labels[self.current_max_y]
+
+    def paint(self, first_x, last_x):
+        # paint the points between two x-values onto the stroke layer
+        if self.drawn is None:
+            return
+        xs = np.flatnonzero(self.drawn[first_x:last_x + 1]) + first_x
+        for x, y in zip(xs.tolist(), self.ys[xs].tolist()):
+            pygame.draw.circle(self.layer, self.line_color, (x, y), 5)
 
     def show(self):
-        surface = pygame.Surface(size=(self.width, self.height))
-        surface.fill(self.background_color)
-        y_text_upper = self.font.render(str(self.current_max_y), True, self.text_color)  # margin numbers displayed
-        y_text_lower = self.font.render(str(0), True, self.text_color)
-        surface.blit(y_text_upper, (0, 0))
-        surface.blit(y_text_lower, (0, self.height - y_text_lower.get_rect().height))
-        if self.values:
-            self.map_to_pixel()
-        for coord in self.drawn_values:
-            pygame.draw.circle(surface, self.line_color, (coord[0], coord[1]), 5)
+        """
+        Returns the stroke layer of the box. It keeps everything drawn so far: only points recorded since the last
+        call are painted. The layer is painted from scratch after zooming and deleting.
+        """
+        self.map_to_pixel()
+        if self.layer is None:
+            self.layer = pygame.Surface(size=(self.width, self.height))
+            self.layer.fill(self.background_color)
+            y_text_upper, y_text_lower = self.get_labels()
+            self.layer.blit(y_text_upper, (0, 0))
+            self.layer.blit(y_text_lower, (0, self.height - y_text_lower.get_rect().height))
+            self.paint(0, self.width)
+        elif self.dirty is not None:
+            self.paint(self.dirty[0], self.dirty[1])
+        return self.layer
+
+
+class Screens:
+    """
+    The screens of a text, built from the layout index when they are needed.
 
-        return surface
+    Only the screens in a window around the current screen are kept as Screen objects with their boxes. A screen
+    that falls out of the window is reduced to its settings and the points drawn on it, it is built again from
+    these when it is needed. Iterating over all screens builds all of them.
+
+    A text that is still being read (see open_text) has a loader: screens that are not laid out yet are read when
+    they are needed, load reads on when there is time for it.
+
+    Attributes:
+        words (WordTable): all words of the text.
+        ranges (list of tuple): (start, stop) of the words of every screen.
+        my_screen (Screen): the Screen object used for layout calculations.
+        window (int): number of screens kept on each side of the current screen.
+        built (dict): screen number -> Screen, for the screens that exist.
+        taken_down (dict): screen number -> (attributes, points, zoom) of the screens that were taken down.
+        settings (list): functions that are called with every screen that is built (see configure).
+        loader (TextLoader): reads the rest of the text, None if the text was laid out completely before.
+    """
+    window = 2
+
+    def __init__(self, words, ranges, my_screen, window=None, loader=None):
+        self.words = words
+        self.ranges = ranges
+        self.my_screen = my_screen
+        if window is not None:
+            self.window = window
+        self.built = {}
+        self.taken_down = {}
+        self.settings = []
+        self.loader = loader
+
+    def __len__(self):
+        # the screens laid out so far (all screens once the text is loaded)
+        return len(self.ranges)
+
+    def __getitem__(self, number):
+        if number < 0:
+            self.load_all()
+            number += len(self)
+        screen = self.get(number) if number >= 0 else None
+        if screen is None:
+            raise IndexError("screen number out of range")
+        return screen
+
+    def __iter__(self):
+        number = 0
+        screen = self.get(number)
+        while screen is not None:
+            yield screen
+            number += 1
+            screen = self.get(number)
+
+    @property
+    def loaded(self):
+        return self.loader is None or self.loader.finished
+
+    def load(self, number=None):
+        """
+        Reads on in a text that is still being loaded.
+
+        Args:
+            number (int, optional): read until this screen is laid out (or the text ends). Defaults to None: one step
+                of the loader.
+
+        Returns:
+            bool: True if there was more of the text to read.
+        """
+        if self.loaded:
+            return False
+        if number is None:
+            self.loader.step()
+        while number is not None and number >= len(self.ranges) and self.loader.step():
+            pass
+        return True
+
+    def load_all(self):
+        while self.load():
+            pass
+
+    def configure(self, setting):
+        """
+        Applies a setting to all screens: now to the screens that exist, later to every screen that is built.
+
+        Args:
+            setting (function): is called with the screen, e.g. to set the allowed keys.
+        """
+        self.settings.append(setting)
+        for screen in self.built.values():
+            setting(screen)
+
+    def get(self, number):
+        """
+        Returns a screen, builds it if it does not exist. None if there is no screen with this number.
+        """
+        if number >= len(self):
+            self.load(number)
+        if not 0 <= number < len(self):
+            return None
+        screen = self.built.get(number)
+        if screen is None:
+            screen = self.built[number] = self.build(number)
+        return screen
+
+    def build(self, number):
+        start, stop = self.ranges[number]
+        my_screen = self.my_screen
+        zoom = DrawBox.current_max_y, MemoryBox.current_max_y  # new boxes set the zoom of all boxes
+        draw_box = DrawBox(current_mx=10, mn=0.1, mx=1000, height=my_screen.drawbox_height,
+                           width=my_screen.drawbox_width, font=self.words[start].font,
+                           background_color=my_screen.draw_box_background, line_color=my_screen.draw_box_line,
+                           text_color=my_screen.draw_box_text)
+        memory_box = MemoryBox(current_mx=10, height=my_screen.memorybox_height,
+                               width=my_screen.drawbox_width, font=self.words[start].font,
+                               background_color=my_screen.draw_box_background, line_color=my_screen.draw_box_line,
+                               text_color=my_screen.draw_box_text)
+        if zoom[0]:  # 0 before the first box of the session
+            DrawBox.current_max_y, MemoryBox.current_max_y = zoom
+        self.words.columns["screen_width"][start:stop] = draw_box.width
+        screen = Screen(drawbox=draw_box, words=self.words[start:stop], memorybox=memory_box, number=number)
+        screen.word_range = (start, stop)
+        screen.table = self.words
+        screen.screens = self
+        for setting in self.settings:
+            setting(screen)
+        if number in self.taken_down:
+            attributes, points, pixel_max_y = self.taken_down.pop(number)
+            screen.__dict__.update(attributes)
+            draw_box.restore(points, pixel_max_y)
+        return screen
+
+    def move_to(self, number):
+        """
+        Makes a screen the current one: the screens outside the window around it are taken down.
+        """
+        for n in [n for n in self.built if abs(n - number) > self.window]:
+            self.take_down(n)
+
+    def take_down(self, number):
+        screen = self.built.pop(number)
+        screen.release_surfaces()
+        attributes = {key: value for key, value in screen.__dict__.items()
+                      if key not in ("drawbox", "memorybox", "words", "table", "text_layer", "screens")}
+        self.taken_down[number] = (attributes,) + screen.drawbox.compact()
+
+
+class TextLayout:
+    """
+    Lays out words on lines and screens in one pass, which can be continued when words are added to the text.
+
+    The first word of a paragraph is laid out differently if the paragraph is the last one of the text (the last
+    paragraph always starts a new screen), so it can only be laid out once it is known whether another paragraph
+    follows.
+
+    Attributes:
+        words (WordTable): the words, with their sizes computed.
+        textbox_width (int): width of the text box in pixels.
+        textbox_height (int): height of the text box in pixels.
+        training (bool): open a new screen for every paragraph.
+        ranges (list of tuple): (start, stop) of the words of every finished screen, in screen order.
+        laid_out (int): number of words laid out so far.
+        paragraph (int): paragraph number of the last word laid out.
+        line (int): line of the last word laid out on its screen.
+        x (int): the x position of the next word on the line.
+        total_x (int): the position of the next word if all lines of the screen were one line.
+        screen_start (int): index of the first word on the screen that is being filled.
+    """
+
+    def __init__(self, words, textbox_width, textbox_height, training=False):
+        self.words = words
+        self.textbox_width = textbox_width
+        self.textbox_height = textbox_height
+        self.training = training
+        self.ranges = []
+        self.laid_out = 0
+        self.paragraph = 1  # paragraph number from the input csv
+        self.line = 1  # number of lines shown in one screen
+        self.x = 0  # the x position the word is shown on on the screen
+        self.total_x = 0  # the position of the word if the length of the whole screen was plotted into one line,
+        # needed for the navigation on the drawing screen
+        self.screen_start = 0
+
+    def close_screen(self, stop, total_x):
+        # the words of a finished screen all share the length of the screen if it were plotted into one line
+        self.words.columns["cumulative_total"][self.screen_start:stop] = total_x
+        self.ranges.append((self.screen_start, stop))
+        self.screen_start = stop
+
+    def extend(self, stop, last_paragraph=None):
+        """
+        Lays out the words up to stop.
+
+        Args:
+            stop (int): index after the last word to lay out.
+            last_paragraph (int, optional): number of the last paragraph of the text. None if it is not known yet,
+                then the words must not include the first word of the last paragraph.
+        """
+        c = self.words.columns
+        start = self.laid_out
+        space = Unit.metrics.measure(" ")[0]
+        n_lines = Unit.number_of_lines
+        textbox_width = self.textbox_width
+        widths = c["width"][start:stop].tolist()
+        paragraphs = c["paragraph"][start:stop].tolist()
+        n = stop - start
+        position_x = [0] * n
+        position_y = [0.] * n
+        cumulative_x = c["cumulative_x"][start:stop].tolist()  # the first word of a training paragraph keeps it
+        cumulative_end = c["cumulative_end"][start:stop].tolist()
+        screen_number = [0] * n
+        line_number = [0] * n
+        current_paragraph, current_screen_line, current_x, total_x = self.paragraph, self.line, self.x, self.total_x
+        for i in range(n):
+            width = widths[i]
+            if paragraphs[i] > current_paragraph:  # new paragraph started!
+                current_paragraph += 1
+                if self.training or last_paragraph == current_paragraph:  # for training: a new screen per paragraph
+                    current_screen_line = 1
+                    self.close_screen(start + i, total_x)
+                    total_x = width + space
+                else:  # not in training
+                    current_screen_line += 1  # for normal screens, new paragraph: new line!
+                    if current_screen_line == n_lines + 1:  # if 10th line is full, change to new screen
+                        current_screen_line = 1
+                        cumulative_x[i] = 0
+                        cumulative_end[i] = width
+                        self.close_screen(start + i, total_x)
+                        total_x = width + space
+                    else:  # there are lines left on the same screen!
+                        cumulative_x[i] = total_x
+                        cumulative_end[i] = total_x + width
+                        total_x = total_x + width + space
+                current_x = width + space
+            else:  # no new paragraph
+                if current_x + width + space < textbox_width:  # does the word fit in this line?
+                    # yes: change nothing but the x position, no: change line number
+                    position_x[i] = current_x
+                    cumulative_x[i] = total_x
+                    cumulative_end[i] = total_x + width
+                    current_x = current_x + width + space
+                    total_x = total_x + width + space
+                else:  # new line needed
+                    current_screen_line += 1
+                    if current_screen_line == n_lines + 1:  # if 10th line is full, change to new screen
+                        current_screen_line = 1
+                        cumulative_x[i] = 0
+                        cumulative_end[i] = width
+                        self.close_screen(start + i, total_x)
+                        total_x = width + space
+                    else:  # screen has room for new line
+                        cumulative_x[i] = total_x
+                        cumulative_end[i] = total_x + width
+                        total_x = total_x + width + space
+                    current_x = width + space
+            position_y[i] = self.textbox_height / n_lines * (current_screen_line - 1)
+            screen_number[i] = len(self.ranges) + 1
+            line_number[i] = current_screen_line
+        self.paragraph, self.line, self.x, self.total_x = current_paragraph, current_screen_line, current_x, total_x
+        c["position_x"][start:stop] = position_x
+        c["position_y"][start:stop] = position_y
+        c["cumulative_x"][start:stop] = cumulative_x
+        c["cumulative_end"][start:stop] = cumulative_end
+        c["screen_width"][start:stop] = textbox_width
+        c["screen_number"][start:stop] = screen_number
+        c["line_number_on_screen"][start:stop] = line_number
+        self.laid_out = stop
+
+    def finish(self):
+        """
+        Finishes the last screen, once all words are laid out.
+
+        Returns:
+            list of tuple: (start, stop) slice bounds into words, one entry per screen in screen order.
+        """
+        if self.laid_out > self.screen_start:
+            self.close_screen(self.laid_out, self.total_x)
+        return self.ranges
+
+
+class TextLoader:
+    """
+    Reads a text paragraph by paragraph and lays out every part as soon as it is read, so the first screens are
+    ready long before a long text is read completely.
+
+    Attributes:
+        paragraphs (iterator of dict): the rows of the text, one per paragraph (see auxiliaries.iter_paragraphs).
+        layout (TextLayout): the layout of the words that are read.
+        unit_delimiter (str): the delimiter between two words.
+        chunk_words (int): number of words read in one step (at least one paragraph).
+        finished (bool): True once the whole text is read and laid out.
+        snapshot (str): key of the layout snapshot that is written once the text is laid out (None: no snapshot).
+    """
+    chunk_words = 2000
+
+    def __init__(self, paragraphs, layout, unit_delimiter=" ", snapshot=None):
+        self.paragraphs = iter(paragraphs)
+        self.layout = layout
+        self.unit_delimiter = unit_delimiter
+        self.finished = False
+        self.snapshot = snapshot
+
+    def step(self):
+        """
+        Reads the next paragraphs, measures their words and lays out all of them but the last paragraph (it can only
+        be laid out once the next paragraph is read, see TextLayout).
+
+        Returns:
+            bool: False if the whole text was already read.
+        """
+        if self.finished:
+            return False
+        words = self.layout.words
+        start = len(words)
+        paragraph = len(words.paragraph_properties)
+        texts, paragraphs, paragraph_properties, last = [], [], [], []
+        for line in self.paragraphs:
+            paragraph += 1
+            text = line["text"]
+            assert (isinstance(text, str))
+            last = text.split(self.unit_delimiter)
+            texts.extend(last)
+            paragraphs.extend([paragraph] * len(last))
+            paragraph_properties.append({key: value for key, value in line.items() if key != "text"})
+            if len(texts) >= self.chunk_words:
+                break
+        else:
+            self.finished = True
+        words.append(texts, paragraphs, paragraph_properties)
+        compute_size_words(words, start, save=False)
+        if self.finished:
+            self.layout.extend(len(words), last_paragraph=paragraph)
+            self.layout.finish()
+            Unit.metrics.save()
+            if self.snapshot is not None:
+                save_snapshot(self.snapshot, words.layout_arrays(),
+                              {"vocabulary": words.vocabulary, "paragraph_properties": words.paragraph_properties,
+                               "ranges": self.layout.ranges, "font_size": Unit.metrics.size})
+        else:
+            self.layout.extend(len(words) - len(last))
+        return True
+
+
+def assign_samples(words, start, stop, values, times):
+    """
+    Adds the drawn points of a screen to its words: every word gets the points whose x lies within its part of the
+    drawing box. The points are ordered by x, so the first and last point of every word are found by a binary search
+    and all word means come from one cumulative sum.
+
+    Args:
+        words (WordTable): all words of the text.
+        start (int): index of the first word of the screen.
+        stop (int): index after the last word of the screen.
+        values (np.ndarray): pairs of (x, value), ordered by x.
+        times (np.ndarray): time of every point.
+
+    Returns:
+        np.ndarray: the mean value of every word of the screen (nan for words without points).
+    """
+    c = words.columns
+    widths = c["screen_width"][start:stop].astype(float)
+    starts = c["cumulative_x"][start:stop].astype(float)
+    ends = c["cumulative_end"][start:stop].astype(float)
+    totals = c["cumulative_total"][start:stop].astype(float)
+    first = np.searchsorted(values[:, 0], widths * starts / totals, side="left")
+    last = np.searchsorted(values[:, 0], widths * ends / totals, side="right")
+    sums = np.concatenate(([0.], np.cumsum(values[:, 1])))
+    counts = np.maximum(last - first, 0)
+    means = np.full(stop - start, np.nan)
+    np.divide(sums[last] - sums[first], counts, out=means, where=counts > 0)
+    # the points of every word one after the other: first[i], ..., last[i] - 1 for every word i
+    offsets = np.cumsum(counts) - counts
+    points = np.repeat(first - offsets, counts) + np.arange(counts.sum())
+    words.samples.extend(np.repeat(np.arange(start, stop), counts), values[points, 1], times[points])
+    return means
 
 
 def get_words(data, unit_delimiter=" "):
     # split all text from data into individual words
-    # for all words, we keep all the further data from each line
-    all_words_split = []
-    number = 0
-    paragraph = 0
-    for line in data:
-        paragraph += 1
+    # for all words, we keep all the further data from each line: the properties of a line are shared by its words
+    texts = []
+    paragraphs = []
+    paragraph_properties = []
+    for paragraph, line in enumerate(data, start=1):
         text = line["text"]
         assert (isinstance(text, str))
         t = text.split(unit_delimiter)
-        for w in t:
-            number += 1
-            properties = {}
-            for word_property in line:
-                if word_property != "text":
-                    properties[word_property] = line[word_property]  # line properties transferred as word properties
-            unit = Unit(w, number, properties)  # initialize word class
-            unit.paragraph = paragraph
-            all_words_split.append(unit)
-    return all_words_split
+        texts.extend(t)
+        paragraphs.extend([paragraph] * len(t))
+        paragraph_properties.append({key: value for key, value in line.items() if key != "text"})
+    return WordTable(texts, paragraphs, paragraph_properties)
+
+
+def index_screens(words):
+    """
+    Builds the screen -> word-range index for words that already carry a screen number.
+
+    Args:
+        words (WordTable): words in reading order, as returned by initialize.
+
+    Returns:
+        list of tuple: (start, stop) slice bounds into words, one entry per screen in screen order.
+    """
+    bounds = [0] + (np.flatnonzero(np.diff(words.columns["screen_number"])) + 1).tolist() + [len(words)]
+    return list(zip(bounds[:-1], bounds[1:])) if len(words) else []
+
+
+def layout_words(words, textbox_width, textbox_height, training=False):
+    """
+    Assigns lines, screens and cumulative positions to all words of a text (see TextLayout).
+
+    Args:
+        words (WordTable): the words with their sizes computed.
+        textbox_width (int): width of the text box in pixels.
+        textbox_height (int): height of the text box in pixels.
+        training (bool, optional): open a new screen for every paragraph. Defaults to False.
+
+    Returns:
+        list of tuple: (start, stop) slice bounds into words, one entry per screen in screen order.
+    """
+    layout = TextLayout(words, textbox_width, textbox_height, training=training)
+    layout.extend(len(words), last_paragraph=int(words.columns["paragraph"].max()))
+    return layout.finish()
 
 
 def initialize(words, my_screen, training=False):
@@ -680,226 +1753,339 @@ def initialize(words, my_screen, training=False):
         Organizes the input words into screens based on screen width and paragraph breaks.
 
         Args:
-            words (list of Unit): List of Unit objects representing individual words or text segments.
+            words (WordTable): the words of the text, with their sizes computed.
             my_screen (Screen): The Screen object used for layout calculations.
             training (bool, optional): Indicates whether the initialization is for training purposes. Defaults to False.
 
         Returns:
-            list of Screens, list of Units: A list of Screen objects and a modified list of Unit objects with screen details.
+            Screens, WordTable: The screens and the words with their screen details.
         """
     assert isinstance(my_screen, Screen)
-    font = words[0].font
-    space = font.render(" ", True, (0, 0, 0)).get_rect().width
-    done = False  # this variable will be true if there are no more words to be split into lines
-    index = 0  # this index will be reset for every line, it counts up until the max nr of words for the line is reached
-    current_paragraph = 1  # paragraph number from the input csv
-    current_screen_line = 1  # number of lines shown in one screen
-    current_screen = 1  # index of screen shown in the experiment
-    current_x = 0  # the x position the word is shown on on the screen
-    total_x = 0  # the position of the word if the length of the whole screen was plotted into one line,
-    n_lines = words[0].number_of_lines
-    max_paragraph = max([x.paragraph for x in words])
-    # needed for the navigation on the drawing screen
-    while not done:
-        word = words[index]
-        assert isinstance(word, Unit)
-        if word.paragraph > current_paragraph:  # new paragraph started!
-            current_paragraph += 1
-            if training or max_paragraph == current_paragraph:  # for training: open a new screen for each paragraph
-                current_screen += 1
-                current_screen_line = 1
-                for w in [x for x in words if x.screen_number == current_screen - 1]:
-                    w.cumulative_total = total_x
-                total_x = word.width + space
-                word.position_x = 0
-            else:  # not in training
-                current_screen_line += 1  # for normal screens, new paragraph: new line!
-                if current_screen_line == n_lines + 1:  # if 10th line is full, change to new screen
-                    current_screen_line = 1
-                    current_screen += 1
-                    word.cumulative_x = 0
-                    word.cumulative_end = word.cumulative_x + word.width
-                    for w in [x for x in words if x.screen_number == current_screen - 1]:
-                        w.cumulative_total = total_x
-                    total_x = word.width + space
-                else:  # there are lines left on the same screen!
-                    word.cumulative_x = total_x
-                    word.cumulative_end = word.cumulative_x + word.width
-                    total_x = total_x + word.width + space
-                word.position_x = 0
-            current_x = word.width + space
-        else:  # no new paragraph
-            if current_x + word.width + space < my_screen.textbox_width:  # does the word fit in this line?
-                # yes: change nothing but the x position, no: change line number
-                word.position_x = current_x
-                word.cumulative_x = total_x
-                word.cumulative_end = word.cumulative_x + word.width
-                current_x = current_x + word.width + space
-                total_x = total_x + word.width + space
-            else:  # new line needed
-                current_screen_line += 1
-                if current_screen_line == n_lines + 1:  # if 10th line is full, change to new screen
-                    current_screen_line = 1
-                    current_screen += 1
-                    word.cumulative_x = 0
-                    word.cumulative_end = word.cumulative_x + word.width
-                    for w in [x for x in words if x.screen_number == current_screen - 1]:
-                        w.cumulative_total = total_x
-                    total_x = word.width + space
-                else:  # screen has room for new line
-                    word.cumulative_x = total_x
-                    word.cumulative_end = word.cumulative_x + word.width
-                    total_x = total_x + word.width + space
-                word.position_x = 0
-                current_x = word.width + space
-        word.position_y = my_screen.textbox_height / n_lines * (current_screen_line - 1)
-        word.screen_number = current_screen
-        word.line_number_on_screen = current_screen_line
-        index = index + 1
-        if index == len(words):
-            done = True
-    for w in [x for x in words if x.screen_number == current_screen]:
-        w.cumulative_total = total_x
-    # print(words)
-    screens = []
-    current_screen = 1
-    for w in words:
-        assert isinstance(w, Unit)
-        if current_screen == w.screen_number:
-            draw_box = DrawBox(current_mx=10, mn=0.1, mx=1000, height=my_screen.drawbox_height,
-                               width=my_screen.drawbox_width, font=w.font,
-                               background_color=my_screen.draw_box_background, line_color=my_screen.draw_box_line,
-                               text_color=my_screen.draw_box_text)
-            memory_box = MemoryBox(current_mx=10, height=my_screen.memorybox_height,
-                                   width=my_screen.drawbox_width, font=w.font,
-                                   background_color=my_screen.draw_box_background, line_color=my_screen.draw_box_line,
-                                   text_color=my_screen.draw_box_text)
-            add = [x for x in words if x.screen_number == current_screen]
-            for x in add:
-                x.screen_width = draw_box.width
-            screens.append(Screen(drawbox=draw_box, words=add, memorybox=memory_box))
-            current_screen += 1
-    for j in range(0, len(screens)):
-        screens[j].number = j
-        if j != 0:
-            screens[j].previous_screen = screens[j - 1]
-        if j != len(screens) - 1:
-            screens[j].next_screen = screens[j + 1]
-    # print(f' this is the number of screens {len(screens)}')
+    ranges = layout_words(words, my_screen.textbox_width, my_screen.textbox_height, training=training)
+    return build_screens(words, ranges, my_screen), words
+
+
+def build_screens(words, ranges, my_screen):
+    """
+    Creates the screens for words that are already laid out.
+
+    Args:
+        words (WordTable): all words of the text, in reading order.
+        ranges (list of tuple): (start, stop) of the words of every screen, as returned by layout_words.
+        my_screen (Screen): The Screen object used for layout calculations.
+
+    Returns:
+        Screens: the screens in order, each one is built when it is needed.
+    """
+    # print(f' this is the number of screens {len(ranges)}')
+    return Screens(words, ranges, my_screen)
+
+
+def load_text(csv_name, my_screen, font_name, colors, training=False, snapshots=False):
+    """
+    Reads a whole text and lays it out on screens.
+
+    Args:
+        csv_name (str): csv file with at least one column named "text", or a plain text file (see
+            auxiliaries.iter_paragraphs).
+        my_screen (Screen): The Screen object used for layout calculations.
+        font_name (str): Name of the font.
+        colors (tuple): the text colors (unchecked, checked).
+        training (bool, optional): open a new screen for every paragraph. Defaults to False.
+        snapshots (bool, optional): use the layout cache (see open_text). Defaults to False.
+
+    Returns:
+        Screens, WordTable: as returned by initialize.
+    """
+    if snapshots:
+        screens, words = open_text(csv_name, my_screen, font_name, colors, training=training, snapshots=True)
+        screens.load_all()
+        return screens, words
+    words = get_words(import_csv(csv_name))
+    words[0].set_color(*colors)
+    words[0].set_font(font_name, my_screen.textbox_height, 10)
+    compute_size_words(words)
+    return initialize(words, my_screen, training=training)
+
+
+def open_text(text_name, my_screen, font_name, colors, training=False, snapshots=False):
+    """
+    Opens a text for reading while it is still being loaded: only the paragraphs up to the first screen are read
+    and laid out, the rest of the text is read when it is needed (Screens.get) or when there is time (Screens.load).
+    The screens and words are the same as those of load_text.
+
+    With snapshots, a text that was laid out before with the same font and geometry is not read at all: its layout
+    is loaded memory-mapped from the layout cache. Otherwise the layout is written to the cache once the text is
+    read completely (see layout_cache.py).
+
+    Args:
+        text_name (str): csv file with at least one column named "text", or a plain text file (see
+            auxiliaries.iter_paragraphs).
+        my_screen (Screen): The Screen object used for layout calculations.
+        font_name (str): Name of the font.
+        colors (tuple): the text colors (unchecked, checked).
+        training (bool, optional): open a new screen for every paragraph. Defaults to False.
+        snapshots (bool, optional): use the layout cache. Defaults to False.
+
+    Returns:
+        Screens, WordTable: the screens and the words, both grow while the text is read.
+    """
+    Unit.set_color(*colors)
+    key = None
+    if snapshots:
+        key = snapshot_key(text_name, font_name, my_screen.textbox_width, my_screen.textbox_height, 10, training)
+        snapshot = load_snapshot(key)
+        if snapshot is not None:
+            Unit.use_font(font_name, snapshot["font_size"], 10)
+            words = WordTable.from_layout(snapshot["arrays"], snapshot["vocabulary"], snapshot["paragraph_properties"])
+            return Screens(words, [tuple(r) for r in snapshot["ranges"]], my_screen), words
+    Unit.set_font(font_name, my_screen.textbox_height, 10)
+    words = WordTable()
+    layout = TextLayout(words, my_screen.textbox_width, my_screen.textbox_height, training=training)
+    loader = TextLoader(iter_paragraphs(text_name), layout, snapshot=key)
+    screens = Screens(words, layout.ranges, my_screen, loader=loader)
+    screens.load(0)
     return screens, words
 
 
-def compute_size_words(words):
+def compute_size_words(words, start=0, save=True):
     # compute the actual size of words in pixels - height stays the same for all words, length differs
-    for word in words:
-        rect = word.font.render(word.text, True, (0, 0, 0)).get_rect()
-        word.width = rect.width
-        word.height = rect.height
+    # every distinct word is measured once, known words come from the font cache
+    # (start: only the words from here on, e.g. the words that were just read)
+    metrics = Unit.metrics
+    codes, inverse = np.unique(words.text_codes[start:], return_inverse=True)
+    sizes = np.array([metrics.measure(words.vocabulary[code]) for code in codes.tolist()],
+                     dtype=np.int32).reshape(-1, 2)
+    words.columns["width"][start:] = sizes[inverse, 0]
+    words.columns["height"][start:] = sizes[inverse, 1]
+    if save:
+        metrics.save()
     return words
 
 
+# the measures of calculate_additional_properties, in the order of the result columns
+MEASURES = ("mean_screen_value", "screen_drawing_time", "screen_starting_time", "time_until_next_screen",
+            "mean_screen_time", "min_screen_time", "max_screen_time", "drawing_time_word", "average_word_time")
+# the columns of the results: word columns, measures, the properties of the word and the number of the text
+RESULT_FIELDS = ("text", "number", "position_x", "cumulative_x", "screen_number", "paragraph",
+                 "line_number_on_screen", "mean_value") + MEASURES
+FANCY_FIELDS = ("text", "number", "width", "height", "position_x", "position_y", "cumulative_x", "cumulative_end",
+                "cumulative_total", "screen_width", "screen_number", "paragraph", "line_number_on_screen", "values",
+                "times", "checked", "mean_value") + MEASURES
+
+
 def calculate_additional_properties(words):
-    for word in words:
-        if word.values:
-            screen_words = [w for w in words if w.screen_number == word.screen_number]
-            screen_starting_time = round(min([t for word in screen_words for t in word.times], default=99999), 4)
-            screen_ending_time = round(max([t for word in screen_words for t in word.times], default=99999), 4)
-            screen_values = [v for word in screen_words for v in word.values]
-            setattr(word, "mean_screen_value", round(np.mean(screen_values), 3))
-            screen_drawing_time = screen_ending_time - screen_starting_time  # calculate time needed to draw line
-            setattr(word, "screen_drawing_time", round(screen_drawing_time, 4))
-            setattr(word, "screen_starting_time", screen_starting_time)
-    all_starting_times = sorted(list(set([w.screen_starting_time for w in words if w.values])))
-    for word in words:
-        if word.values:
-            word.mean_value = round(np.mean(word.values), 3)
-            try:
-                next_starting_time = all_starting_times[all_starting_times.index(word.screen_starting_time) + 1]
-                setattr(word, "time_until_next_screen", round(next_starting_time - word.screen_starting_time, 4))
-            except IndexError:
-                setattr(word, "time_until_next_screen", 99999)
-    all_screen_times = sorted(list(set([w.screen_drawing_time for w in words if w.values])))
-    for w in words:
-        setattr(w, "mean_screen_time", round(np.mean(all_screen_times), 4))  # calculate mean reading time for screens
-        setattr(w, "min_screen_time", round(min(all_screen_times, default=99999), 4))  # calculate shortest screen time
-        setattr(w, "max_screen_time", round(max(all_screen_times, default=99999), 4))  # calculate longest screen time
-        setattr(w, "drawing_time_word", round(max(w.times, default=99999) - min(w.times, default=99999), 4))
-    for w in words:
-        setattr(w, "average_word_time", round(np.mean([word.drawing_time_word for word in words if word.values]), 4))
+    """
+    Calculates the derived timing and value measures for all words and keeps them in the measures of the table.
+
+    The samples of the text are one ragged array in reading order (see SampleStore), all per-screen and per-word
+    measures are calculated from it at once. The result is kept in the metrics of the table: saving the same words again
+    (fancy_save and save_and_compress) does not calculate anything twice, until words or samples change.
+
+    Args:
+        words (WordTable): all words of the text, in reading order.
+
+    Returns:
+        dict: the calculated columns (numpy arrays, one entry per word or per screen)
+    """
+    offsets, values, times = words.samples.pack()
+    counts = np.diff(offsets)
+    key = (len(words), words.samples.changes)
+    if words.metrics is not None and words.metrics[0] == key:
+        return words.metrics[1]
+    drawn = counts > 0
+    n_samples = int(offsets[-1])
+    word_starts = offsets[:-1]  # index of the first sample of each word
+    word_screens = words.columns["screen_number"]
+    sample_screens = np.repeat(word_screens, counts)
+
+    # per screen (samples are in reading order, so the samples of a screen are next to each other)
+    screens, screen_starts, screen_counts = np.unique(sample_screens, return_index=True, return_counts=True)
+    if n_samples:
+        screen_starting_times = np.minimum.reduceat(times, screen_starts)
+        screen_ending_times = np.maximum.reduceat(times, screen_starts)
+        screen_sums = np.add.reduceat(values, screen_starts)
+    else:
+        screen_starting_times = screen_ending_times = screen_sums = np.empty(0)
+    screen_starting_times = np.array([round(t, 4) for t in screen_starting_times.tolist()])
+    screen_ending_times = np.array([round(t, 4) for t in screen_ending_times.tolist()])
+    mean_screen_values = screen_sums / np.maximum(screen_counts, 1)
+    # calculate time needed to draw line
+    screen_drawing_times = np.array([round(t, 4) for t in (screen_ending_times - screen_starting_times).tolist()])
+    all_starting_times = np.unique(screen_starting_times)
+    next_index = np.searchsorted(all_starting_times, screen_starting_times) + 1
+    has_next = next_index < len(all_starting_times)
+    time_until_next_screen = np.full(len(screens), 99999.)
+    time_until_next_screen[has_next] = all_starting_times[next_index[has_next]] - screen_starting_times[has_next]
+    all_screen_times = np.unique(screen_drawing_times)
+    mean_screen_time = round(float(np.mean(all_screen_times)), 4) if len(all_screen_times) else float("nan")
+    min_screen_time = round(float(np.min(all_screen_times)), 4) if len(all_screen_times) else 99999
+    max_screen_time = round(float(np.max(all_screen_times)), 4) if len(all_screen_times) else 99999
+
+    # per word
+    mean_values = np.zeros(len(words))
+    word_min_times = np.full(len(words), 99999.)
+    word_max_times = np.full(len(words), 99999.)
+    if n_samples:
+        mean_values[drawn] = np.add.reduceat(values, word_starts[drawn]) / counts[drawn]
+        word_min_times[drawn] = np.minimum.reduceat(times, word_starts[drawn])
+        word_max_times[drawn] = np.maximum.reduceat(times, word_starts[drawn])
+    drawing_times_word = np.array([round(t, 4) for t in (word_max_times - word_min_times).tolist()])
+    average_word_time = round(float(np.mean(drawing_times_word[drawn])), 4) if drawn.any() else float("nan")
+
+    # the screen measures of the drawn words (the measures of words without samples are nan)
+    s = np.searchsorted(screens, word_screens[drawn])
+    measures = {name: np.full(len(words), np.nan) for name in MEASURES[:4]}
+    measures["mean_screen_value"][drawn] = [round(v, 3) for v in mean_screen_values[s].tolist()]
+    measures["screen_drawing_time"][drawn] = screen_drawing_times[s]
+    measures["screen_starting_time"][drawn] = screen_starting_times[s]
+    measures["time_until_next_screen"][drawn] = [99999. if t == 99999 else round(t, 4)
+                                                 for t in time_until_next_screen[s].tolist()]
+    words.columns["mean_value"][drawn] = [round(v, 3) for v in mean_values[drawn].tolist()]
+    measures["mean_screen_time"] = mean_screen_time  # calculate mean reading time for screens
+    measures["min_screen_time"] = min_screen_time  # calculate shortest screen time
+    measures["max_screen_time"] = max_screen_time  # calculate longest screen time
+    measures["drawing_time_word"] = drawing_times_word
+    measures["average_word_time"] = average_word_time
+    words.measures = measures
+    columns = {"screens": screens, "screen_starting_time": screen_starting_times,
+               "screen_drawing_time": screen_drawing_times, "mean_screen_value": mean_screen_values,
+               "time_until_next_screen": time_until_next_screen, "mean_value": mean_values,
+               "drawing_time_word": drawing_times_word}
+    words.metrics = (key, columns)
+    return columns
 
 
 def fancy_save(words, c_round, resultfile):
+    """
+    Appends the results of a session with one row per drawn sample: all word columns and measures, the value and
+    time of the sample, the properties of the word and the number of the text.
+    """
     calculate_additional_properties(words)
-    new_words = []
-    for word in words:
-        assert isinstance(word, Unit)
-        for key, value in word.properties.items():
-            setattr(word, key, value)
-        for i in range(len(word.values)):
-            new_word = word.__dict__.copy()
-            new_word["values"] = round(word.values[i], 3)
-            new_word["times"] = round(word.times[i], 4)
-            new_word["text_number_in_experiment"] = c_round
-            new_word.pop("properties")
-            new_words.append(new_word)
-    my_keys = new_words[0].keys()
+    offsets, values, times = words.samples.pack()
+    drawn = np.flatnonzero(np.diff(offsets))
+    if not len(drawn):
+        return
+    columns = {name: words.field(name, drawn) for name in FANCY_FIELDS if name not in ("values", "times")}
+    paragraphs = words.columns["paragraph"][drawn].tolist()
+    properties = words.properties()
     with open(resultfile, 'a', newline='') as r_file:
-        dict_writer = csv.DictWriter(r_file, my_keys, dialect="excel", delimiter=";")
-        dict_writer.writeheader()
-        for w in new_words:
-            dict_writer.writerow(w)
+        dict_writer = None
+        for i, index in enumerate(drawn.tolist()):
+            word = {name: None if name in ("values", "times") else columns[name][i] for name in FANCY_FIELDS}
+            word.update(properties[paragraphs[i] - 1])
+            word["text_number_in_experiment"] = c_round
+            if dict_writer is None:
+                dict_writer = csv.DictWriter(r_file, word.keys(), dialect="excel", delimiter=";")
+                dict_writer.writeheader()
+            for value, t in zip(values[offsets[index]:offsets[index + 1]].tolist(),
+                                times[offsets[index]:offsets[index + 1]].tolist()):
+                word["values"] = round(value, 3)
+                word["times"] = round(t, 4)
+                dict_writer.writerow(word)
+
+
+def result_rows(words, c_round):
+    """
+    Builds the result row of every drawn word: the word columns and measures, its properties and the round.
+    Repeated rows are skipped.
 
+    Args:
+        words (WordTable): all words of the text.
+        c_round (int): number of the text in the experiment.
 
-def save_and_compress(words, c_round, resultfile):
+    Yields:
+        tuple: (index, row) for every drawn word, row is a dict of column name -> value.
+    """
     calculate_additional_properties(words)
-    new_words = []
-    for word in words:
-        assert isinstance(word, Unit)
-        for key, value in word.properties.items():
-            setattr(word, key, value)
-        for i in range(len(word.values)):
-            new_word = word.__dict__.copy()
-            new_word["values"] = round(word.values[i], 3)
-            new_word["times"] = round(word.times[i], 4)
-            new_word["text_number_in_experiment"] = c_round
-            new_word.pop("properties")
-            new_word.pop("width")
-            new_word.pop("height")
-            new_word.pop("position_y")
-            new_word.pop("cumulative_end")
-            new_word.pop("cumulative_total")
-            new_word.pop("screen_width")
-            new_word.pop("checked")
-            new_word.pop("times")
-            new_word.pop("values")
-            new_words.append(new_word)
-    my_words = []
-    for i in new_words:
-        if i not in my_words:
-            my_words.append(i)
-    dataframe = compress_data(my_words)
-    dataframe.to_csv(resultfile, mode="a", header=True)
+    drawn = np.flatnonzero(words.samples.counts())
+    columns = [words.field(name, drawn) for name in RESULT_FIELDS]
+    paragraphs = words.columns["paragraph"][drawn].tolist()
+    properties = words.properties()
+    seen = set()  # the values of the rows built so far
+    for i, index in enumerate(drawn.tolist()):
+        row = {name: column[i] for name, column in zip(RESULT_FIELDS, columns)}
+        row.update(properties[paragraphs[i] - 1])
+        row["text_number_in_experiment"] = c_round
+        values = tuple(row.values())
+        if values in seen:
+            continue
+        seen.add(values)
+        yield index, row
+
+
+def save_and_compress(words, c_round, resultfile, batch_size=1000):
+    """
+    Appends the results of a session to the result file: one row per drawn word, with a header for the session.
+
+    The rows are built from the words directly (not once per drawn sample), repeated rows are skipped and the
+    rows are written in batches, so memory does not grow with the number of samples.
+
+    Args:
+        words (WordTable): all words of the text.
+        c_round (int): number of the text in the experiment.
+        resultfile (str): path of the csv file the results are appended to.
+        batch_size (int, optional): number of rows written at once. Defaults to 1000.
+    """
+    batch = []
+    writer = None
+    with open(resultfile, 'a', newline='') as r_file:
+        for index, (_, row) in enumerate(result_rows(words, c_round)):
+            if writer is None:
+                writer = csv.DictWriter(r_file, [""] + list(row.keys()), dialect="excel", lineterminator=os.linesep)
+                writer.writeheader()
+            row[""] = index  # the row index of the session (first column, as it used to be written by pandas)
+            batch.append(row)
+            if len(batch) == batch_size:
+                writer.writerows(batch)
+                batch = []
+        if batch:
+            writer.writerows(batch)
+
+
+def save_columnar(words, c_round, directory):
+    """
+    Saves the results of a session as a compressed columnar partition (see columnar.py): the rows of
+    save_and_compress with typed columns, and every drawn sample once.
+
+    Args:
+        words (WordTable): all words of the text.
+        c_round (int): number of the text in the experiment.
+        directory (str): directory of the partitions, one file per session.
+
+    Returns:
+        str: path of the written partition.
+    """
+    rows, sample_rows, sample_values, sample_times = [], [], [], []
+    offsets, values, times = words.samples.pack()
+    for index, row in result_rows(words, c_round):
+        a, b = offsets[index], offsets[index + 1]
+        sample_rows.extend([len(rows)] * int(b - a))
+        sample_values.extend(values[a:b].tolist())
+        sample_times.extend(times[a:b].tolist())
+        rows.append(row)
+    participant = rows[0].get("Teilnahme-ID", "session") if rows else "session"
+    path = partition_name(directory, participant, c_round, int(SessionClock.wall_anchor))
+    write_partition(path, rows, (sample_rows, sample_values, sample_times))
+    return path
 
 
 def line_save(words, result_file):
-    all_screens = max([y.screen_number for y in words])
-    line_list = []
-    line_nr = 0
-    for y in range(1, all_screens + 1):
-        screen_words = [z for z in words if z.screen_number == y]
-        line_count = max([z.line_number_on_screen for z in screen_words])
-        for z in range(1, line_count + 1):
-            line = {"line_nr": line_nr, "screen_nr": y, "line_nr_on_screen": z}
-            line_text = " ".join([w.text for w in screen_words if w.line_number_on_screen == z])
-            line["text"] = line_text
-            line_list.append(line)
-            line_nr += 1
-    my_keys = line_list[0].keys()
+    # one row per line of the layout, the lines are numbered through all screens
+    c = words.columns
+    new_line = (np.diff(c["screen_number"]) != 0) | (np.diff(c["line_number_on_screen"]) != 0)
+    starts = [0] + (np.flatnonzero(new_line) + 1).tolist()
+    stops = starts[1:] + [len(words)]
+    screens = c["screen_number"][starts].tolist()
+    lines = c["line_number_on_screen"][starts].tolist()
+    texts = words.texts()
     with open(result_file, 'w', newline='') as r_file:
-        dict_writer = csv.DictWriter(r_file, my_keys, dialect="excel", delimiter=";")
+        dict_writer = csv.DictWriter(r_file, ("line_nr", "screen_nr", "line_nr_on_screen", "text"), dialect="excel",
+                                     delimiter=";")
         dict_writer.writeheader()
-        for w in line_list:
-            dict_writer.writerow(w)
+        for line_nr, (start, stop, screen, line) in enumerate(zip(starts, stops, screens, lines)):
+            dict_writer.writerow({"line_nr": line_nr, "screen_nr": screen, "line_nr_on_screen": line,
+                                  "text": " ".join(texts[start:stop])})
 
 
 def set_meta_data(meta_data_dict):